@@ -0,0 +1,44 @@
+"""Time deep stack operations at increasing stack depths.
+
+Each operation touches K items, so its cost should stay flat as the
+depth grows.
+
+    python -m benchmarks.stack_depth
+"""
+import timeit
+
+from rpn.stack import Stack
+
+DEPTHS = (1_000, 10_000, 100_000, 300_000)
+K = 8
+NUMBER = 2_000
+
+
+def make_stack(depth):
+    s = Stack()
+    for i in range(depth):
+        s.push(float(i))
+    return s
+
+
+CASES = {
+    'peek': lambda s: s.peek(K),
+    'dup+drop': lambda s: (s.dup(K), s.drop(K)),
+    'pick': lambda s: s.pick(K),
+    'roll+rolld': lambda s: (s.roll(K), s.rolld(K)),
+}
+
+
+def main():
+    print(f"{'op':<12}" + ''.join(f'{d:>12,}' for d in DEPTHS))
+    for name, case in CASES.items():
+        row = []
+        for depth in DEPTHS:
+            s = make_stack(depth)
+            seconds = timeit.timeit(lambda: case(s), number=NUMBER)
+            row.append(f'{seconds / NUMBER * 1e6:>10.2f}us')
+        print(f'{name:<12}' + ''.join(row))
+
+
+if __name__ == '__main__':
+    main()
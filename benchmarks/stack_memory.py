@@ -0,0 +1,42 @@
+"""Compare memory use and push/pop throughput of the stack storages.
+
+    python -m benchmarks.stack_memory [COUNT]
+"""
+import sys
+import time
+import tracemalloc
+
+from rpn.stack import Stack
+
+
+def measure(compact, count):
+    tracemalloc.start()
+    s = Stack(compact=compact)
+    for i in range(count):
+        s.push(i * 0.5)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    s.clear()
+    start = time.perf_counter()
+    for i in range(count):
+        s.push(i * 0.5)
+    pushed = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(count):
+        s.pop()
+    popped = time.perf_counter() - start
+    return size, pushed, popped
+
+
+def main(count=1_000_000):
+    print(f'{count:,} floats')
+    for compact in (False, True):
+        size, pushed, popped = measure(compact, count)
+        print(f"{'compact' if compact else 'deque':<8}"
+              f'{size / count:>8.1f} bytes/value'
+              f'{count / pushed / 1e6:>8.2f}M push/s'
+              f'{count / popped / 1e6:>8.2f}M pop/s')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
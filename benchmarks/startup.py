@@ -0,0 +1,85 @@
+"""Measure cold-start latency of trivial rpn invocations.
+
+Times the in-process fast path the rpn command takes for plain
+expressions, the full click command line (python -m rpn) and a bare
+interpreter for reference, then lists the slowest imports of the fast
+path as reported by python -X importtime. Commands run with an empty
+home and cache directory and no RPN_DAEMON, so ~/.rpnrc, cached state
+and a running daemon don't affect the timings.
+
+    python -m benchmarks.startup [RUNS]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+EXPRESSION = ['1', '2', '+']
+
+FAST_PATH = ('import sys; sys.argv = ["rpn"] + sys.argv[1:]; '
+             'from rpn.client import main; main()')
+
+CASES = {
+    'python': [sys.executable, '-c', 'pass'],
+    'rpn (fast path)': [sys.executable, '-c', FAST_PATH] + EXPRESSION,
+    'python -m rpn': [sys.executable, '-m', 'rpn'] + EXPRESSION,
+}
+
+TOP = 15
+
+
+def isolated_env(home):
+    """Return an environment without ~/.rpnrc, cached state or a daemon."""
+    env = dict(os.environ, HOME=home,
+               XDG_CACHE_HOME=os.path.join(home, '.cache'))
+    env.pop('RPN_DAEMON', None)
+    return env
+
+
+def wall_clock(command, runs, env=None):
+    """Return the median wall-clock seconds of running command."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, check=True,
+                       env=env)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def import_times(command, env=None):
+    """Return (cumulative us, self us, module) for every import."""
+    result = subprocess.run(
+        command[:1] + ['-X', 'importtime'] + command[1:],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        check=True, env=env)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, module = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), int(own), module[1:].rstrip()))
+    return rows
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with tempfile.TemporaryDirectory() as home:
+        env = isolated_env(home)
+        print(f"{'command':<20}{'median':>12}")
+        for name, command in CASES.items():
+            seconds = wall_clock(command, runs, env)
+            print(f'{name:<20}{seconds * 1e3:>10.1f}ms')
+
+        rows = import_times(CASES['rpn (fast path)'], env)
+    top_level = sum(c for c, own, module in rows if not module.startswith(' '))
+    print(f'\nfast path imports: {top_level / 1e3:.1f}ms, slowest:')
+    print(f"{'cumulative':>12}{'self':>10}  module")
+    for cumulative, own, module in sorted(rows, reverse=True)[:TOP]:
+        print(f'{cumulative / 1e3:>10.1f}ms{own / 1e3:>8.1f}ms  {module}')
+
+
+if __name__ == '__main__':
+    main()
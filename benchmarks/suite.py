@@ -0,0 +1,276 @@
+"""Benchmark the evaluator and compare runs for regressions.
+
+run times every benchmark and writes the results as JSON (to stdout,
+or to FILE with -o). Each result is the time of one operation, eg. one
+token or one stack method call, in seconds: the median and spread of
+REPEAT samples, each long enough to average out the clock resolution.
+
+compare reads two result files and lists every benchmark whose median
+changed by more than the threshold, exiting with status 1 if any got
+slower.
+
+    python -m benchmarks.suite run [-o FILE] [-k PATTERN] [--quick]
+    python -m benchmarks.suite compare BASE NEW [--threshold PERCENT]
+"""
+import argparse
+import datetime
+import fnmatch
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+
+from rpn import __version__
+from rpn import compiler
+from rpn import lexer
+from rpn import tools
+from rpn.context import Context
+from rpn.macros import Macro
+
+from . import startup
+
+FORMAT = 1
+
+DEPTHS = (10, 1_000, 100_000)
+PROMPT_DEPTHS = (10, 1_000, 10_000)
+MACRO_DEPTH = 6
+NUMBERS = ('42', '-7', '3.25', '1e30', '0x1f', '0b1011', '1_000_000', 'nan')
+
+# case name: (function of a stack, stack methods it calls)
+STACK_CASES = {
+    'push+pop': (lambda s: (s.push(1.5), s.pop()), 2),
+    'size': (lambda s: s.size(), 1),
+    'peek': (lambda s: s.peek(2), 1),
+    'dup+drop': (lambda s: (s.dup(), s.drop()), 2),
+    'swap': (lambda s: s.swap(), 1),
+    'pick': (lambda s: s.pick(2), 1),
+    'roll+rolld': (lambda s: (s.roll(), s.rolld()), 2),
+    'depth+pop': (lambda s: (s.depth(), s.pop()), 2),
+}
+
+
+def filled(depth, compact=False, mode='h'):
+    ctx = Context(compact=compact)
+    ctx.stack_mode = mode
+    for i in range(depth):
+        ctx.stack.push(i * 0.5)
+    return ctx
+
+
+def dispatch_cases():
+    ctx = Context()
+    tokens = ('1', '2', '+', 'drop')
+
+    def digest():
+        for token in tokens:
+            tools.digest_command(token, ctx)
+    yield 'dispatch/digest_command', digest, len(tokens)
+
+
+def parse_cases():
+    def cached():
+        for s in NUMBERS:
+            tools.str_to_num(s)
+
+    # the same parsing, without the cache in front of it
+    parse = lexer.parse_number.__wrapped__
+
+    def uncached():
+        for s in NUMBERS:
+            parse(s)
+    yield 'parse/str_to_num', cached, len(NUMBERS)
+    yield 'parse/uncached', uncached, len(NUMBERS)
+
+
+def stack_cases():
+    for storage in ('deque', 'compact'):
+        for depth in DEPTHS:
+            stack = filled(depth, storage == 'compact').stack
+            for name, (case, calls) in STACK_CASES.items():
+                yield (f'stack/{name}/{storage}/{depth}',
+                       lambda case=case, stack=stack: case(stack), calls)
+
+
+def macro_cases():
+    # m0 adds 1, every further level runs the one below it twice
+    ctx = Context()
+    ctx.vars['m0'] = Macro(('1', '+'))
+    for level in range(1, MACRO_DEPTH + 1):
+        ctx.vars[f'm{level}'] = Macro((f'm{level - 1}',) * 2)
+    ctx.stack.push(0)
+    commands = [f'm{MACRO_DEPTH}']
+
+    def run():
+        tools.digest_input(commands, ctx)
+
+    def recompile():
+        # redefining m0 drops the compiled code of every macro above it
+        ctx.vars['m0'] = Macro(('1', '+'))
+        compiler.compile(commands, ctx.vars)
+    yield f'macro/run/{MACRO_DEPTH}', run, 1
+    yield f'macro/recompile/{MACRO_DEPTH}', recompile, 1
+
+
+def prompt_cases():
+    for mode in ('h', 'v'):
+        for depth in PROMPT_DEPTHS:
+            ctx = filled(depth, mode=mode)
+            yield (f'prompt/{mode}/{depth}',
+                   lambda ctx=ctx: tools.generate_prompt(ctx), 1)
+
+
+def repeat_cases():
+    ctx = filled(1)
+    commands = ['100', 'repeat', 'dup', '100', 'repeat', 'drop']
+    yield 'repeat/dup+drop/100', lambda: tools.digest_input(commands, ctx), 200
+
+
+def startup_cases():
+    with tempfile.TemporaryDirectory() as home:
+        env = startup.isolated_env(home)
+        for name, command in startup.CASES.items():
+            yield (f'startup/{name}', lambda command=command: subprocess.run(
+                command, stdout=subprocess.DEVNULL, check=True, env=env), 1)
+
+
+GROUPS = (dispatch_cases, parse_cases, stack_cases, macro_cases,
+          prompt_cases, repeat_cases, startup_cases)
+
+
+def measure(func, ops, repeat, min_time):
+    """Return the seconds per operation of func, one per sample."""
+    timer = timeit.Timer(func)
+    number = 1
+    # grow the loop count until a sample takes at least min_time
+    while True:
+        if timer.timeit(number) >= min_time:
+            break
+        number *= 2 if number < 8 else 10
+    samples = [t / number / ops for t in timer.repeat(repeat, number)]
+    return number, samples
+
+
+def run(pattern, repeat, min_time):
+    results = {}
+    for group in GROUPS:
+        for name, func, ops in group():
+            if not fnmatch.fnmatchcase(name, pattern):
+                continue
+            number, samples = measure(func, ops, repeat, min_time)
+            results[name] = {
+                'unit': 's',
+                'ops': ops,
+                'number': number,
+                'repeat': repeat,
+                'median': statistics.median(samples),
+                'min': min(samples),
+                'max': max(samples),
+            }
+            print(f"{name:<40}{format_time(results[name]['median']):>12}",
+                  file=sys.stderr)
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'rpn': __version__,
+        'commit': commit,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+    }
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e3), ('us', 1e6)):
+        if seconds * scale >= 1:
+            return f'{seconds * scale:.3g}{unit}'
+    return f'{seconds * 1e9:.3g}ns'
+
+
+def compare(base, new, threshold):
+    """Print the benchmarks that changed, return the number of slowdowns."""
+    if base.get('format') != FORMAT or new.get('format') != FORMAT:
+        raise SystemExit('ERROR: unsupported result format')
+    base, new = base['benchmarks'], new['benchmarks']
+    regressions = 0
+    print(f"{'benchmark':<40}{'base':>10}{'new':>10}{'change':>9}")
+    for name in sorted(base.keys() & new.keys()):
+        before, after = base[name]['median'], new[name]['median']
+        change = after / before - 1
+        if change > threshold:
+            flag = 'SLOWER'
+            regressions += 1
+        elif change < -threshold:
+            flag = 'faster'
+        else:
+            flag = ''
+        print(f'{name:<40}{format_time(before):>10}{format_time(after):>10}'
+              f'{change:>+9.1%}  {flag}')
+    for name in sorted(base.keys() - new.keys()):
+        print(f'{name:<40} only in base')
+    for name in sorted(new.keys() - base.keys()):
+        print(f'{name:<40} only in new')
+    print(f'\n{regressions} regression(s) over {threshold:.0%}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('-o', '--output', help='write JSON here')
+    run_parser.add_argument(
+        '-k', dest='pattern', default='*',
+        help='only run benchmarks matching this glob, eg. "stack/*"')
+    run_parser.add_argument('--repeat', type=int, default=7)
+    run_parser.add_argument('--min-time', type=float, default=0.05,
+                            help='seconds each sample takes at least')
+    run_parser.add_argument('--quick', action='store_true',
+                            help='3 short samples per benchmark')
+    compare_parser = commands.add_parser(
+        'compare', help='compare two result files')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument(
+        '--threshold', type=float, default=10,
+        help='percent change of a median to report (default 10)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'compare':
+        with open(args.base) as fp:
+            base = json.load(fp)
+        with open(args.new) as fp:
+            new = json.load(fp)
+        sys.exit(1 if compare(base, new, args.threshold / 100) else 0)
+
+    repeat, min_time = (3, 0.01) if args.quick else (
+        args.repeat, args.min_time)
+    report = {
+        'format': FORMAT,
+        'created': datetime.datetime.now(
+            datetime.timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'settings': {'repeat': repeat, 'min_time': min_time},
+        'benchmarks': run(args.pattern, repeat, min_time),
+    }
+    text = json.dumps(report, indent=2, sort_keys=True) + '\n'
+    if args.output:
+        with open(args.output, 'w') as fp:
+            fp.write(text)
+    else:
+        sys.stdout.write(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,34 @@ import sys
 __author__ = 'James La Guma'
 __version__ = '0.1'
 
-if sys.version_info.major < 3 or (sys.version_info.minor < 6
+if sys.version_info.major < 3 or (sys.version_info.minor < 7
                                   and sys.version_info.major == 3):
-    raise ImportError('Python < 3.6 is unsupported.')
+    raise ImportError('Python < 3.7 is unsupported.')
+
+# The library is imported on first use, so that the thin client started
+# by the rpn command doesn't pay for it.
+_EXPORTS = {
+    'compile': 'api',
+    'evaluate': 'api',
+    'Expression': 'api',
+    'RPNError': 'errors',
+    'ParseError': 'errors',
+    'UnknownNameError': 'errors',
+    'UnknownColumnError': 'errors',
+    'StackUnderflowError': 'errors',
+    'OperatorError': 'errors',
+    'SnapshotError': 'errors',
+}
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    from importlib import import_module
+    value = getattr(import_module(f'.{_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_EXPORTS))
@@ -40,9 +40,148 @@ from .decorators import add_custom_help
     help='Stack display mode.',
     type=click.Choice(['h', 'v']),
 )
+@click.option(
+    '--int-pow',
+    is_flag=True,
+    help='Keep pow of integers exact, instead of converting to float.',
+)
+@click.option(
+    '--digits',
+    '-d',
+    type=click.IntRange(min=0),
+    help='Show integers with more digits as their leading and trailing '
+    'digits and a digit count (default 0, every digit is shown).',
+)
+@click.option(
+    '--compact',
+    '-c',
+    is_flag=True,
+    help='Pack numbers on the stack into arrays to save memory.',
+)
+@click.option(
+    '--vector',
+    is_flag=True,
+    help='Apply operators element-wise to vectors (needs NumPy).',
+)
+@click.option(
+    '--array',
+    '-a',
+    'arrays',
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help='Push a vector read from a file of numbers. Can be repeated.',
+)
+@click.option(
+    '--file',
+    '-f',
+    'scripts',
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help='Execute a script file after ~/.rpnrc. Can be repeated.',
+)
+@click.option(
+    '--load',
+    'load_path',
+    type=click.Path(exists=True, dir_okay=False),
+    help='Start from the stack and variables of a snapshot file.',
+)
+@click.option(
+    '--save',
+    'save_path',
+    type=click.Path(dir_okay=False, writable=True),
+    help='Save the stack and variables to a snapshot file on exit.',
+)
+@click.option(
+    '--stream',
+    '-s',
+    is_flag=True,
+    help='Evaluate the expression once for every line of stdin, with the '
+    'line\'s fields pushed on a fresh stack.',
+)
+@click.option(
+    '--jobs',
+    '-j',
+    type=click.IntRange(min=1),
+    help='Evaluate stdin in N worker processes, one expression per line, '
+    'or one record per line when an expression is given.',
+)
+@click.option(
+    '--csv',
+    'csv_path',
+    type=click.Path(exists=True, dir_okay=False),
+    help='Add a column with the value of the expression to a CSV file. '
+    'Columns are referenced as $name or $number.',
+)
+@click.option(
+    '--column',
+    default='result',
+    help='Name of the column added by --csv.',
+)
+@click.option(
+    '--output',
+    '-O',
+    type=click.Path(dir_okay=False, writable=True),
+    help='Write the --csv output to a file instead of stdout.',
+)
+@click.option(
+    '--serve',
+    is_flag=True,
+    help='Evaluate lines sent by clients, each connection with its own '
+    'stack and variables.',
+)
+@click.option(
+    '--daemon',
+    is_flag=True,
+    help='Evaluate rpn commands forwarded by clients that have RPN_DAEMON '
+    'set, on --socket or the default socket.',
+)
+@click.option(
+    '--host',
+    default='127.0.0.1',
+    help='Address --serve listens on.',
+)
+@click.option(
+    '--port',
+    default=7777,
+    type=click.IntRange(0, 65535),
+    help='Port --serve listens on.',
+)
+@click.option(
+    '--socket',
+    'socket_path',
+    type=click.Path(dir_okay=False),
+    help='Make --serve or --daemon listen on this Unix socket.',
+)
+@click.option(
+    '--profile',
+    is_flag=True,
+    help='Count and time every operator and macro, and show the report at '
+    'exit. prof shows it any time.',
+)
+@click.option(
+    '--trace',
+    'trace_path',
+    type=click.Path(dir_okay=False, writable=True),
+    help='Append a JSON line for every operator run to a file. -j workers '
+    'write to FILE.PID.',
+)
+@click.option(
+    '--trace-size',
+    default=64,
+    type=click.IntRange(min=1),
+    help='Megabytes at which the --trace file is rotated.',
+)
+@click.option(
+    '--explain',
+    '-x',
+    is_flag=True,
+    help='Show the compiled expression instead of evaluating it.',
+)
 @click.argument('args', nargs=-1)
 @add_custom_help
-def main(verbose, ops, eg, base, mode, args):
+def main(verbose, ops, eg, base, mode, int_pow, digits, compact, vector, arrays, scripts,
+         load_path, save_path, stream, jobs, csv_path, column, output, serve, daemon, host, port,
+         socket_path, profile, trace_path, trace_size, explain, args):
     """Supports:\tcommand line mode, interactive mode, macros, variables.
 Note:\t\tContents of ~/.rpnrc will be executed at the startup.
     """
@@ -56,14 +195,50 @@ Note:\t\tContents of ~/.rpnrc will be executed at the startup.
         tools.set_base(base)
     if mode:
         tools.set_mode(mode)
+    if int_pow:
+        tools.set_int_pow()
+    if digits is not None:
+        tools.set_digits(digits)
+    if compact:
+        tools.set_compact()
+    if vector:
+        tools.set_vector()
 
     # check if there ie ~/.rpnrc file and execute commands inside it
-    tools.process_rpnrc()
+    tools.process_rpnrc(scripts=scripts)
+    if load_path:
+        tools.load_snapshot(load_path)
+    if profile:
+        tools.start_profile()
+    trace = (trace_path, trace_size << 20) if trace_path else None
+    if trace:
+        tools.start_trace(*trace)
+
+    for path in arrays:
+        tools.load_array(path)
 
-    if (args):
-        tools.command_line_mode(args)
+    if explain:
+        tools.explain(args)
+    elif serve:
+        from .server import serve as serve_forever
+        serve_forever(host, port, socket_path)
+    elif daemon:
+        from .client import default_socket, socket_path as client_socket
+        from .server import daemon as serve_clients
+        serve_clients(socket_path or client_socket() or default_socket())
+    elif jobs:
+        from .batch import batch_mode
+        batch_mode(args, jobs, trace=trace)
+    elif stream:
+        from .stream import stream_mode
+        stream_mode(args)
+    elif csv_path:
+        from .csvmode import csv_mode
+        csv_mode(args, csv_path, output, column)
+    elif (args):
+        tools.command_line_mode(args, save=save_path)
     else:
-        tools.interactive_mode()
+        tools.interactive_mode(save=save_path)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,91 @@
+from threading import local
+
+from . import compiler
+from .context import Context
+from .errors import StackUnderflowError
+from .macros import Variables
+from .ops import Operations
+
+# Every thread evaluates in a context of its own, reset between calls.
+_contexts = local()
+
+# Variables programs are compiled against, keyed by the names they hold.
+# Only names that shadow an operator compile differently, and those are
+# rare, so most programs compile against the empty variables.
+_signatures = {frozenset(): Variables()}
+
+
+def _context():
+    try:
+        ctx = _contexts.ctx
+    except AttributeError:
+        ctx = _contexts.ctx = Context(strict=True)
+        # expressions may come from anywhere, keep them away from files
+        ctx.files = False
+    ctx.stack.clear()
+    ctx.repeat = 1
+    # toggles like intpow and hex mustn't carry over to the next call
+    ctx.reset_settings()
+    return ctx
+
+
+def _compile_for(tokens, names):
+    shadowed = frozenset(name for name in names if name in Operations.table)
+    variables = _signatures.get(shadowed)
+    if variables is None:
+        variables = _signatures.setdefault(
+            shadowed, Variables((name, 0) for name in shadowed))
+    return compiler.compile(tokens, variables)
+
+
+def _tokens(expr):
+    return tuple(expr.split() if isinstance(expr, str) else expr)
+
+
+def _run(program, args, variables):
+    ctx = _context()
+    ctx.vars = dict(variables) if variables else {}
+    push = ctx.stack.push
+    for arg in args:
+        push(arg)
+    compiler.run(program, ctx)
+    if ctx.stack.size() == 0:
+        raise StackUnderflowError('The expression left no result.')
+    return ctx.stack.pop()
+
+
+class Expression:
+    """A compiled expression, callable with different inputs.
+
+    Positional arguments are pushed on the stack, in order, before the
+    expression runs; keyword arguments are its variables. Calling it
+    returns the top of the stack or raises an rpn.errors.RPNError.
+    """
+    __slots__ = ('tokens', 'program')
+
+    def __init__(self, expr):
+        self.tokens = _tokens(expr)
+        self.program = _compile_for(self.tokens, ())
+
+    def __repr__(self):
+        return f"Expression({' '.join(self.tokens)!r})"
+
+    def __call__(self, *args, **variables):
+        program = self.program
+        if variables and not Operations.table.keys().isdisjoint(variables):
+            program = _compile_for(self.tokens, variables)
+        return _run(program, args, variables)
+
+
+def compile(expr):
+    """Compile an expression, a string or a list of tokens, for reuse."""
+    return Expression(expr)
+
+
+def evaluate(expr, variables=None):
+    """Evaluate an expression and return the top of the stack.
+
+    Raises an rpn.errors.RPNError if the expression can't be evaluated.
+    """
+    tokens = _tokens(expr)
+    return _run(_compile_for(tokens, variables or ()), (), variables)
@@ -0,0 +1,111 @@
+import io
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from . import tools
+from . import compiler
+from .macros import Variables
+from .stack import CompactStorage
+from .stream import BUFFER_SIZE, evaluate_record
+
+# Number of input lines sent to a worker at once.
+CHUNK_SIZE = 16384
+
+# Session settings copied from the main process into every worker.
+SHARED_SETTINGS = ('verbose', 'base', 'stack_mode', 'vector', 'int_pow',
+                   'digits')
+
+
+def _init_worker(shared, compact, variables, trace):
+    """Give a worker the main process' settings, variables and macros."""
+    # results go back to the main process; keep stray output off stdout
+    sys.stdout = sys.stderr
+    session = tools.session
+    for name, value in shared.items():
+        setattr(session, name, value)
+    # a forked worker inherits the main process' state, start afresh
+    session.vars = Variables(variables)
+    session.stack.clear()
+    session.stack.set_compact(compact)
+    session.monitor = session.profile = None
+    if trace is not None:
+        # one trace per worker, flushed after every chunk
+        from .trace import Trace
+        path, max_bytes = trace
+        session.monitor = Trace(f'{path}.{os.getpid()}', max_bytes)
+
+
+def evaluate_line(line):
+    """Evaluate one expression on a fresh stack and format the result."""
+    stack = tools.session.stack
+    stack.clear()
+    tools.session.repeat = 1
+    commands = line.split()
+    if commands:
+        try:
+            tools.digest_input(commands)
+        except SystemExit:
+            return ''
+    if stack.size() > 0:
+        return f'{tools.apply_base(stack.pop())}'
+    return ''
+
+
+def _evaluate_chunk(commands, lines):
+    if commands:
+        program = compiler.compile(commands, tools.session.vars)
+        results = [evaluate_record(program, line) for line in lines]
+    else:
+        results = [evaluate_line(line) for line in lines]
+    if tools.session.monitor is not None:
+        tools.session.monitor.flush()
+    return ''.join(f'{result}\n' for result in results)
+
+
+def _chunks(lines, size):
+    while True:
+        chunk = list(islice(lines, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def batch_mode(commands, jobs, infile=None, outfile=None, trace=None):
+    """Evaluate lines of infile in a pool of worker processes.
+
+    With commands, every line is a record the commands are applied to,
+    as in stream mode; otherwise every line is an expression of its own.
+    Results are written in input order. trace is a (path, max_bytes)
+    pair for workers to trace to, each in its own file.
+    """
+    if infile is None:
+        infile = io.open(sys.stdin.fileno(), buffering=BUFFER_SIZE,
+                         closefd=False)
+    if outfile is None:
+        outfile = io.open(sys.stdout.fileno(), 'w', buffering=BUFFER_SIZE,
+                          closefd=False)
+    session = tools.session
+    shared = {name: getattr(session, name) for name in SHARED_SETTINGS}
+    compact = isinstance(session.stack.stack, CompactStorage)
+    # variables and macros from ~/.rpnrc and script files, so workers
+    # don't have to run them again
+    variables = list(session.vars.copy().items())
+    commands = tuple(commands)
+    initargs = (shared, compact, variables, trace)
+    with ProcessPoolExecutor(jobs, initializer=_init_worker,
+                             initargs=initargs) as pool:
+        # keep a bounded number of chunks in flight, so memory use does
+        # not depend on the input size
+        pending = deque()
+        try:
+            for chunk in _chunks(infile, CHUNK_SIZE):
+                pending.append(pool.submit(_evaluate_chunk, commands, chunk))
+                if len(pending) >= 2 * jobs:
+                    outfile.write(pending.popleft().result())
+            while pending:
+                outfile.write(pending.popleft().result())
+        finally:
+            outfile.flush()
@@ -0,0 +1,159 @@
+import os
+import pickle
+import zlib
+
+from . import __version__
+from . import compiler
+from .context import Context
+from .errors import RPNError
+from .macros import Macro, Variables
+from .opcodes import CALL, REPEAT, NAME, LOAD, SAVE, RESTORE, BLOCKS
+from .ops import Operations, PURE_TYPES
+
+# Operator types that only depend on the stack and variables, so running
+# a file made of them always leaves the same state behind.
+REPRODUCIBLE_TYPES = PURE_TYPES | {'stack'}
+
+# Version of the pickled state, whose macros hold compiled code. Bump it
+# whenever the opcodes or the layout of compiled code change.
+CACHE_FORMAT = 4
+
+# Returned instead of a state key once a file couldn't be cached: the
+# state it left behind can't be reproduced, so neither can later ones.
+UNCACHEABLE = 'uncacheable'
+
+
+def cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'rpn')
+
+
+def reproducible(code, variables, seen=frozenset()):
+    """Tell if compiled code only uses operators with reproducible effects.
+
+    Display toggles, random numbers, vectors, exit, $columns and files
+    all depend on or change more than the stack and variables.
+    """
+    for opcode, arg, func in code:
+        if opcode in (LOAD, SAVE, RESTORE):
+            return False
+        if opcode in BLOCKS:
+            if not all(reproducible(body, variables, seen)
+                       for body in func[1]):
+                return False
+            continue
+        macro = variables.get(arg) if opcode == NAME else None
+        if isinstance(macro, Macro):
+            # a macro run by name, eg. a recursive one
+            if arg not in seen and not reproducible(
+                    compiler.macro_code(macro, arg, variables), variables,
+                    seen | {arg}):
+                return False
+        elif opcode in (CALL, REPEAT, NAME) and func is not None:
+            op_type = Operations.table[arg].op_type
+            if op_type not in REPRODUCIBLE_TYPES and arg != 'repeat':
+                return False
+    return True
+
+
+def evaluate(lines, ctx):
+    """Run lines in a copy of ctx, return the copy or None if it's unsafe.
+
+    A copy that printed anything, eg. a verbose failure or an unknown
+    name, is unsafe: replaying its state would lose the output.
+    """
+    output = []
+    scratch = Context(variables=ctx.vars, echo=output.append)
+    scratch.verbose = True
+    scratch.int_pow = ctx.int_pow
+    for item in ctx.stack.dump():
+        scratch.stack.push(item)
+    for line in lines:
+        commands = line.split()
+        try:
+            program = compiler.compile(commands, scratch.vars)
+            if not reproducible(program.raw, scratch.vars):
+                return None
+            compiler.run(program, scratch)
+        except RPNError:
+            return None
+        if output:
+            return None
+    return scratch
+
+
+def run_file(path, ctx, previous=None):
+    """Run a script file in ctx, reusing the state it left the last time.
+
+    previous is the key returned for the file run before this one, None
+    if ctx is fresh. The cached state is keyed by the path, mtime, size,
+    rpn version, cache format, pow mode and previous, so it is dropped
+    whenever any of them changes. Return the key of the state the file left behind.
+    """
+    stat = os.stat(path)
+    if previous is None and (ctx.vars or ctx.stack.size()):
+        previous = UNCACHEABLE
+    if previous == UNCACHEABLE:
+        _run_lines(path, ctx)
+        return UNCACHEABLE
+    path = os.path.abspath(path)
+    key = (path, stat.st_mtime_ns, stat.st_size, __version__, CACHE_FORMAT,
+           ctx.int_pow, previous)
+    # one entry per file and starting state, replaced when the file changes
+    name = zlib.crc32(repr((path, previous)).encode())
+    entry = os.path.join(cache_dir(), f'{name:08x}.pickle')
+    snapshot = _load(entry, key)
+    if snapshot is None:
+        with open(path) as fp:
+            scratch = evaluate(list(fp), ctx)
+        if scratch is None:
+            _run_lines(path, ctx)
+            return UNCACHEABLE
+        snapshot = _snapshot(scratch)
+        _save(entry, key, snapshot)
+    variables, stack, repeat = snapshot
+    ctx.vars = Variables(variables)
+    ctx.stack.clear()
+    for item in stack:
+        ctx.stack.push(item)
+    ctx.repeat = repeat
+    return key
+
+
+def _run_lines(path, ctx):
+    from .tools import digest_input
+    with open(path) as fp:
+        for line in fp:
+            digest_input(line.split(), ctx)
+
+
+def _snapshot(ctx):
+    # compile every macro now, so loading the snapshot needs no compiling
+    for name, value in ctx.vars.items():
+        if isinstance(value, Macro):
+            compiler.macro_code(value, name, ctx.vars)
+    return list(ctx.vars.items()), ctx.stack.dump(), ctx.repeat
+
+
+def _load(entry, key):
+    try:
+        with open(entry, 'rb') as fp:
+            cached_key, snapshot = pickle.load(fp)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError,
+            ImportError, ValueError):
+        return None
+    return snapshot if cached_key == key else None
+
+
+def _save(entry, key, snapshot):
+    tmp = f'{entry}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        with open(tmp, 'wb') as fp:
+            pickle.dump((key, snapshot), fp, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, entry)
+    except (OSError, pickle.PicklingError):
+        # a missing cache only costs the next startup some time
+        if os.path.exists(tmp):
+            os.unlink(tmp)
@@ -0,0 +1,119 @@
+import os
+import sys
+
+# Set to 1 to forward invocations to the daemon on the default socket, or
+# to the path of the daemon's socket.
+DAEMON_ENV = 'RPN_DAEMON'
+# Seconds to wait for a daemon to accept the connection before evaluating
+# in-process.
+TIMEOUT = 5
+# Statements that read or write files, which the daemon refuses.
+FILE_COMMANDS = ('save', 'load')
+
+
+def default_socket():
+    directory = os.environ.get('XDG_RUNTIME_DIR') or '/tmp'
+    return os.path.join(directory, f'rpn-{os.getuid()}.sock')
+
+
+def socket_path():
+    """Return the daemon's socket, or None if forwarding is off."""
+    value = os.environ.get(DAEMON_ENV, '')
+    if value in ('', '0'):
+        return None
+    return default_socket() if value == '1' else value
+
+
+def forwardable(args):
+    """Only plain expressions are forwarded; options run in-process.
+
+    As for the option parser, the first -- ends the options. Before it
+    a token starting with - is an option, unless it's an operator or a
+    number, eg. - or -1. save and load run in-process too, so that file
+    names are relative to the caller's directory, not the daemon's.
+    """
+    options = True
+    for arg in args:
+        if arg in FILE_COMMANDS:
+            return False
+        if not options:
+            continue
+        if arg == '--':
+            options = False
+        elif arg.startswith('-') and not _operand(arg):
+            return False
+    return len(args) > (0 if options else 1)
+
+
+def _operand(arg):
+    from .lexer import parse_number
+    from .ops import Operations
+    return arg in Operations.table or parse_number(arg) is not None
+
+
+def forward(path, args):
+    """Evaluate args in the daemon.
+
+    Return the exit status and output, or None if no daemon accepted
+    the connection. Once one has, its reply is waited for however long
+    the evaluation takes.
+    """
+    import socket
+    chunks = []
+    try:
+        s = socket.socket(socket.AF_UNIX)
+    except (OSError, AttributeError):
+        # no Unix sockets on this platform
+        return None
+    with s:
+        try:
+            s.settimeout(TIMEOUT)
+            s.connect(path)
+        except OSError:
+            # no daemon
+            return None
+        s.settimeout(None)
+        try:
+            s.sendall('\0'.join(args).encode())
+            s.shutdown(socket.SHUT_WR)
+            while True:
+                chunk = s.recv(1 << 16)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        except OSError:
+            pass
+    status, newline, output = b''.join(chunks).partition(b'\n')
+    if not newline:
+        # the command may have run, so it isn't evaluated again
+        sys.stderr.write('ERROR: the daemon closed the connection.\n')
+        return 1, b''
+    return int(status), output
+
+
+def main():
+    """Entry point of the rpn command.
+
+    Plain expressions are forwarded to a running daemon when RPN_DAEMON
+    is set, so neither the evaluator nor ~/.rpnrc are loaded, or else
+    evaluated in-process without loading the option parser. Anything
+    else runs the full command line.
+    """
+    args = sys.argv[1:]
+    if not forwardable(args):
+        from .__main__ import main as cli
+        cli()
+        return
+    if '--' in args:
+        args.remove('--')
+    path = socket_path()
+    if path:
+        reply = forward(path, args)
+        if reply is not None:
+            status, output = reply
+            sys.stdout.buffer.write(output)
+            sys.stdout.flush()
+            sys.exit(status)
+    from . import tools
+    tools.process_rpnrc()
+    tools.command_line_mode(args)
@@ -0,0 +1,269 @@
+from threading import Lock
+from collections import namedtuple, OrderedDict
+
+from . import lexer
+from .errors import ParseError, UnknownNameError, UnknownColumnError
+from .macros import Macro
+from .opcodes import (
+    PUSH, CALL, REPEAT, NAME, STORE, DEFINE, LOAD, SAVE, RESTORE, ENTER, EXIT,
+    TIMES, BRANCH, WHILE, walk,
+)
+from .optimizer import optimize
+from .ops import Operations
+
+
+CACHE_SIZE = 1024
+
+# Statements taking a file name, eg. save state.rpns
+FILE_STATEMENTS = {'save': SAVE, 'load': RESTORE}
+
+# Keywords taking blocks, eg. [ dup * ] 3 times: opcode and block count
+BLOCK_KEYWORDS = {
+    'times': (TIMES, 1),
+    'if': (BRANCH, 1),
+    'ifelse': (BRANCH, 2),
+    'while': (WHILE, 1),
+}
+
+
+Program = namedtuple('Program', ['code', 'raw'])
+
+# Compiled programs, least recently used first. Programs hold plain
+# operator functions, so every context can share them.
+_programs = OrderedDict()
+_programs_lock = Lock()
+
+
+def compile(commands, variables):
+    """Compile a list of tokens into a program, reusing cached programs."""
+    # the generation is part of the cache key: programs inline the macros
+    # and operators that existed when they were compiled
+    key = (tuple(commands), variables.generation)
+    with _programs_lock:
+        program = _programs.get(key)
+        if program is not None:
+            _programs.move_to_end(key)
+            return program
+    raw, names = _translate(key[0], variables, frozenset())
+    program = Program(code=optimize(raw), raw=raw)
+    with _programs_lock:
+        _programs[key] = program
+        if len(_programs) > CACHE_SIZE:
+            _programs.popitem(last=False)
+    return program
+
+
+def _translate(commands, variables, linking):
+    """Translate tokens into code, inlining macros not in linking."""
+    if not commands:
+        return (), set()
+    # detect macro command: eg. macro kb 1024 *
+    if commands[0] == 'macro':
+        if len(commands) < 2:
+            raise ParseError('macro needs a name')
+        return ((DEFINE, commands[1], commands[2:]),), set()
+    if commands[0] in FILE_STATEMENTS:
+        # a load replaces the variables that running code still holds
+        if linking:
+            raise ParseError(f'{commands[0]} can\'t be used in a macro')
+        if len(commands) != 2:
+            raise ParseError(f'{commands[0]} needs a single file name')
+        return ((FILE_STATEMENTS[commands[0]], commands[1], None),), set()
+    first = lexer.classify(commands[0])
+    # detecting "x=" command
+    if first.kind == lexer.ASSIGN:
+        return ((STORE, first.value, None),), set()
+    code, names, dynamic = _translate_tokens(commands, variables, linking)
+    return code, names
+
+
+def _translate_tokens(commands, variables, linking, dynamic=False):
+    """Translate tokens, compiling blocks into the keyword that runs them.
+
+    dynamic tells if names can no longer be resolved at compile time,
+    because an inlined macro has defined or stored a name; it is
+    returned updated along with the code and the names it refers to.
+    """
+    code = []
+    names = set()
+    # compiled blocks waiting for their keyword
+    blocks = []
+    position = 0
+    while position < len(commands):
+        command = commands[position]
+        position += 1
+        if command == '[':
+            end = _block_end(commands, position)
+            body, body_names, dynamic = _translate_tokens(
+                commands[position:end], variables, linking, dynamic)
+            blocks.append(body)
+            names |= body_names
+            position = end + 1
+            continue
+        if command == ']':
+            raise ParseError('] without a matching [')
+        if command in BLOCK_KEYWORDS:
+            opcode, count = BLOCK_KEYWORDS[command]
+            if len(blocks) < count:
+                raise ParseError(f'{command} needs {count} block(s)')
+            bodies = tuple(blocks[len(blocks) - count:])
+            del blocks[len(blocks) - count:]
+            if command == 'if':
+                bodies += ((),)
+            code.append((opcode, command, (bodies, bodies)))
+            continue
+        instruction = _compile_token(command, variables, dynamic)
+        if instruction[0] in (PUSH, LOAD):
+            code.append(instruction)
+            continue
+        names.add(command)
+        macro = variables.get(command)
+        if isinstance(macro, Macro) and command not in linking:
+            body = macro_code(macro, command, variables, linking)
+            # markers for the profiler, the optimizer drops them
+            code.append((ENTER, command, None))
+            code.extend(body)
+            code.append((EXIT, command, None))
+            names |= macro.names
+            dynamic = dynamic or any(
+                i[0] in (STORE, DEFINE) for i in walk(body))
+        else:
+            code.append(instruction)
+    if blocks:
+        raise ParseError('a block needs times, if, ifelse or while after it')
+    return tuple(code), names, dynamic
+
+
+def _block_end(commands, start):
+    """Return the position of the ] closing a block that starts at start."""
+    depth = 1
+    for position in range(start, len(commands)):
+        if commands[position] == '[':
+            depth += 1
+        elif commands[position] == ']':
+            depth -= 1
+            if depth == 0:
+                return position
+    raise ParseError('[ without a matching ]')
+
+
+def _compile_token(command, variables, dynamic=False):
+    token = lexer.classify(command)
+    if token.kind == lexer.NUMBER:
+        return (PUSH, token.value, None)
+    if token.kind == lexer.COLUMN:
+        return (LOAD, token.value, None)
+    op = Operations.table.get(command)
+    func = op.op_function if op else None
+    if func is None or dynamic or command in variables:
+        return (NAME, command, func)
+    if command == 'repeat':
+        return (REPEAT, command, func)
+    return (CALL, command, func)
+
+
+def macro_code(macro, name, variables, linking=frozenset()):
+    """Return the compiled body of a macro, compiling it if it is stale."""
+    if macro.code is None:
+        code, names = _translate(macro.tokens, variables, linking | {name})
+        macro.code, macro.names = code, frozenset(names)
+    return macro.code
+
+
+def run(program, ctx):
+    """Execute a compiled program in a context."""
+    # monitors need the macro markers only the raw code has, and the
+    # optimized code may have folded away the operator a pending repeat
+    # applies to, so only run it when nothing is pending
+    if ctx.monitor is not None:
+        ctx.monitor.execute(program.raw, ctx)
+    elif ctx.repeat == 1:
+        run_code(program.code, ctx)
+    else:
+        run_code(program.raw, ctx)
+
+
+def execute(code, ctx):
+    """Execute compiled code against the stack of a context."""
+    if ctx.monitor is None:
+        run_code(code, ctx)
+    else:
+        ctx.monitor.execute(code, ctx)
+
+
+def run_code(code, ctx):
+    """Execute compiled code, without a monitor watching it."""
+    ops = ctx.ops
+    push = ctx.stack.push
+    variables = ctx.vars
+    for opcode, arg, func in code:
+        if opcode == PUSH:
+            push(arg)
+        elif opcode == CALL:
+            if ctx.repeat == 1:
+                func(ops)
+            else:
+                call_repeated(func, ctx)
+        elif opcode == NAME:
+            # variables and macros take precedence over operators
+            if arg in variables:
+                expand(arg, ctx)
+            elif func is None:
+                raise UnknownNameError(arg)
+            elif arg == 'repeat':
+                func(ops)
+            else:
+                call_repeated(func, ctx)
+        elif opcode == REPEAT:
+            func(ops)
+        elif opcode == STORE:
+            variables[arg] = ctx.stack.pop()
+        elif opcode == DEFINE:
+            variables[arg] = Macro(func)
+        elif opcode == LOAD:
+            if arg not in ctx.columns:
+                raise UnknownColumnError(arg)
+            push(ctx.columns[arg])
+        elif opcode == SAVE:
+            ops.save(arg)
+        elif opcode == RESTORE:
+            ops.load(arg)
+        elif opcode == TIMES:
+            for _ in range(ops.block_count(arg)):
+                execute(block(func, 0, ctx), ctx)
+        elif opcode == BRANCH:
+            condition = ops.block_condition(arg)
+            if condition is not None:
+                execute(block(func, 0 if condition else 1, ctx), ctx)
+        elif opcode == WHILE:
+            execute(block(func, 0, ctx), ctx)
+            while ops.block_condition(arg):
+                execute(block(func, 0, ctx), ctx)
+
+
+def block(func, n, ctx):
+    """Return body n of a block, the raw one if a repeat is pending."""
+    # as in run, the optimized body may have folded away the operator
+    # the repeat applies to
+    return func[0][n] if ctx.repeat == 1 else func[1][n]
+
+
+def columns(program):
+    """Return the column references a program loads."""
+    return {arg for opcode, arg, func in walk(program.raw) if opcode == LOAD}
+
+
+def call_repeated(func, ctx):
+    """Call an operator as many times as the last repeat asked for."""
+    for _ in range(ctx.repeat):
+        func(ctx.ops)
+    ctx.repeat = 1
+
+
+def expand(name, ctx):
+    """Push a variable, or run the body of a macro."""
+    value = ctx.vars[name]
+    if isinstance(value, Macro):
+        execute(macro_code(value, name, ctx.vars), ctx)
+    else:
+        ctx.stack.push(value)
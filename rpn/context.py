@@ -0,0 +1,68 @@
+from . import settings
+from .formatting import FAST_BITS
+from .macros import Variables
+from .ops import Operations
+from .stack import Stack
+
+
+class Context:
+    """An evaluation session.
+
+    A context owns its stack, variables, repeat counter and display
+    settings, and the operators are bound to it, so any number of
+    contexts can be evaluated side by side. New contexts start with the
+    defaults from rpn.settings.
+
+    Operator output goes to echo, and is discarded by default. A strict
+    context raises rpn.errors exceptions when an operator fails, instead
+    of skipping it.
+    """
+    def __init__(self, compact=False, variables=None, strict=False,
+                 echo=None):
+        self.stack = Stack(compact)
+        if isinstance(variables, Variables):
+            self.vars = variables.copy()
+        else:
+            self.vars = Variables(variables or ())
+        self.repeat = 1
+        self.reset_settings()
+        # (key, texts) of the items the last prompt showed
+        self.rendered = (None, {})
+        # values of the current record's columns, keyed by reference
+        self.columns = {}
+        self.strict = strict
+        # whether save and load may touch files
+        self.files = True
+        # a profiler.Monitor executing code while profiling or tracing,
+        # and the profile collecting stats for prof
+        self.monitor = None
+        self.profile = None
+        self.echo = echo or _discard
+        self.ops = Operations(self)
+
+    def reset_settings(self):
+        """Set the display and evaluation settings to rpn.settings'."""
+        self.verbose = settings.verbose
+        self.base = settings.base
+        self.stack_mode = settings.stack_mode
+        self.vector = settings.vector
+        self.int_pow = settings.int_pow
+        self.digits = settings.digits
+        self.prompt_items = settings.prompt_items
+
+    @property
+    def digits(self):
+        return self._digits
+
+    @digits.setter
+    def digits(self, digits):
+        self._digits = digits
+        # integers with more bits are formatted by formatting.format_int
+        self.long_bits = min(digits or FAST_BITS, FAST_BITS)
+
+    def __repr__(self):
+        return f'Context({self.stack!r}, vars={dict(self.vars)!r})'
+
+
+def _discard(message):
+    pass
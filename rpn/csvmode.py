@@ -0,0 +1,158 @@
+import csv
+import sys
+from itertools import islice
+import click
+
+from . import lexer
+from . import compiler
+from . import vector
+from .errors import RPNError
+from .tools import apply_base, run, session
+
+# Rows read and evaluated at once, which bounds memory use.
+BLOCK_ROWS = 1 << 16
+# Integers up to this size are exact as floats too, see evaluate_columns.
+EXACT_INT = 1 << 53
+
+
+def resolve(ref, header):
+    """Return the index of the column a reference like bytes or 2 names."""
+    if ref in header:
+        return header.index(ref)
+    if ref.isdigit() and 0 < int(ref) <= len(header):
+        return int(ref) - 1
+    click.echo(f'ERROR: ${ref} is not a known column.', err=True)
+    sys.exit(2)
+
+
+def format_result(value, ctx=session):
+    if value is None:
+        return ''
+    return f'{apply_base(value, ctx)}'
+
+
+def evaluate_row(program, indexes, row, ctx=session):
+    """Evaluate a program on a fresh stack for one row."""
+    columns = {}
+    for ref, index in indexes.items():
+        value = lexer.parse_number(row[index]) if index < len(row) else None
+        if value is None:
+            return None
+        columns[ref] = value
+    ctx.columns = columns
+    ctx.repeat = 1
+    ctx.stack.clear()
+    run(program, ctx)
+    return ctx.stack.pop()
+
+
+def parse_column(np, cells):
+    """Parse a column of cells into an array, None if a cell isn't a number.
+
+    Columns of floats become float64 arrays, and columns of integers
+    int64 ones while floats hold them exactly. Anything else is kept as
+    Python numbers in an object array, so big integers stay exact.
+    """
+    values = [lexer.parse_number(cell) for cell in cells]
+    if None in values:
+        return None
+    types = set(map(type, values))
+    if types == {float}:
+        return np.array(values, dtype=np.float64)
+    if types == {int} and -EXACT_INT <= min(values) and max(
+            values) <= EXACT_INT:
+        return np.array(values, dtype=np.int64)
+    return np.array(values, dtype=object)
+
+
+def evaluate_columns(program, indexes, rows, ctx=session):
+    """Evaluate a program once, on whole columns.
+
+    Return one result per row, or None if the columns or the program
+    can't be evaluated as vectors, eg. because a cell is missing or an
+    operator fails on some element. The rows are then evaluated one at
+    a time, which gives the same results.
+    """
+    np = vector.numpy()
+    columns = {}
+    for ref, index in indexes.items():
+        column = parse_column(np, [row[index] if index < len(row) else ''
+                                   for row in rows])
+        if column is None:
+            return None
+        columns[ref] = column
+    results = _evaluate(program, columns, len(rows), ctx)
+    ints = [ref for ref, column in columns.items()
+            if column.dtype == np.int64]
+    if results is None or not ints:
+        return results
+    # int64 arithmetic wraps around silently: an overflow shows up as a
+    # difference from the same evaluation in floats
+    floats = dict(columns)
+    for ref in ints:
+        floats[ref] = columns[ref].astype(np.float64)
+    check = _evaluate(program, floats, len(rows), ctx)
+    if check is not None and np.allclose(
+            np.array(results, dtype=np.float64),
+            np.array(check, dtype=np.float64), rtol=1e-9, atol=0):
+        return results
+    for ref in ints:
+        columns[ref] = columns[ref].astype(object)
+    return _evaluate(program, columns, len(rows), ctx)
+
+
+def _evaluate(program, columns, size, ctx):
+    ctx.columns = columns
+    # a failure anywhere must not be mistaken for a result
+    vector_mode, ctx.vector = ctx.vector, True
+    strict, ctx.strict = ctx.strict, True
+    ctx.repeat = 1
+    ctx.stack.clear()
+    try:
+        with vector.numpy().errstate(all='raise'):
+            run(program, ctx)
+    except RPNError:
+        return None
+    finally:
+        ctx.vector = vector_mode
+        ctx.strict = strict
+    result = ctx.stack.pop()
+    if result is None:
+        return None
+    if not vector.is_array(result):
+        return [result] * size
+    if result.shape != (size,):
+        return None
+    return result.tolist()
+
+
+def csv_mode(commands, path, output=None, column='result', ctx=session):
+    """Add a column holding the value of an expression to a CSV file.
+
+    The file is read in blocks of BLOCK_ROWS rows. When NumPy is
+    installed the columns of a block are evaluated at once, otherwise
+    its rows are evaluated one at a time.
+    """
+    program = compiler.compile(commands, ctx.vars)
+    vectors = vector.available()
+    with open(path, newline='') as infile, \
+            open(output or sys.stdout.fileno(), 'w', newline='',
+                 closefd=output is not None) as outfile:
+        reader = csv.reader(infile)
+        writer = csv.writer(outfile)
+        header = next(reader, [])
+        indexes = {ref: resolve(ref, header)
+                   for ref in compiler.columns(program)}
+        writer.writerow(header + [column])
+        while True:
+            rows = list(islice(reader, BLOCK_ROWS))
+            if not rows:
+                break
+            results = None
+            if vectors:
+                results = evaluate_columns(program, indexes, rows, ctx)
+            if results is None:
+                results = [evaluate_row(program, indexes, row, ctx)
+                           for row in rows]
+            writer.writerows(row + [format_result(result, ctx)]
+                             for row, result in zip(rows, results))
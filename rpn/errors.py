@@ -0,0 +1,32 @@
+class RPNError(Exception):
+    """Base class for the errors raised while evaluating expressions."""
+
+
+class ParseError(RPNError, ValueError):
+    """An expression is malformed, eg. a macro without a name."""
+
+
+class UnknownNameError(RPNError):
+    """A token is not a number, an operator, a variable or a macro."""
+    def __init__(self, name):
+        super().__init__(f'{name} is not a number or a supported operator.')
+        self.name = name
+
+
+class UnknownColumnError(RPNError):
+    """A $column reference has no value."""
+    def __init__(self, column):
+        super().__init__(f'${column} is not a known column.')
+        self.column = column
+
+
+class StackUnderflowError(RPNError):
+    """There are fewer items on the stack than an operation needs."""
+
+
+class OperatorError(RPNError):
+    """An operator failed, eg. a division by zero."""
+
+
+class SnapshotError(RPNError):
+    """A snapshot file can't be written or read."""
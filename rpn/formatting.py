@@ -0,0 +1,125 @@
+import decimal
+import math
+
+# Integers up to this many bits are formatted with format(), which is
+# quadratic in decimal but fast at this size, and stays below the
+# 4300 digit limit of int to str conversion in recent Pythons.
+FAST_BITS = 8192
+
+# Bits per digit of the power of two bases.
+_BITS_PER_DIGIT = {'b': 1, 'o': 3, 'x': 4}
+
+# Pieces this small are converted to Decimal directly.
+_PIECE_BITS = 128
+
+_LOG10_2 = math.log10(2)
+
+# Extra digits computed when estimating the leading ones.
+_GUARD = 12
+
+
+def format_int(n, base='d', digits=0):
+    """Format an integer in base 'b', 'o', 'd' or 'x'.
+
+    With digits, an integer that has more of them is shown as its
+    leading and trailing digits and the digit count, eg.
+    1234...6789 (5000 digits). Only the digits shown are computed.
+    """
+    if n < 0:
+        return '-' + format_int(-n, base, digits)
+    bits = n.bit_length()
+    if base != 'd':
+        count = max(1, -(-bits // _BITS_PER_DIGIT[base]))
+        if not digits or count <= digits:
+            return format(n, base)
+        return _truncated_power_of_two(n, base, digits, count)
+    if not digits or bits * _LOG10_2 < digits:
+        return to_decimal(n)
+    leading = _leading_decimal(n, digits - digits // 2)
+    if leading is None:
+        # too close to a rounding boundary to trust the estimate
+        text = to_decimal(n)
+        if len(text) <= digits:
+            return text
+        leading = text[:digits - digits // 2], len(text)
+    lead, count = leading
+    if count <= digits:
+        return to_decimal(n)
+    tail = digits // 2
+    tail = str(n % 10 ** tail).zfill(tail) if tail else ''
+    return f'{lead}...{tail} ({count} digits)'
+
+
+def _truncated_power_of_two(n, base, digits, count):
+    shift = _BITS_PER_DIGIT[base]
+    tail = digits // 2
+    lead = format(n >> (count - (digits - tail)) * shift, base)
+    tail = format(n & ((1 << tail * shift) - 1), base).zfill(tail) if (
+        tail) else ''
+    return f'{lead}...{tail} ({count} digits)'
+
+
+def _leading_decimal(n, k):
+    """Return the first k decimal digits of n > 0 and its digit count.
+
+    They are read off a Decimal estimate made from the top bits of n.
+    Return None when the digits after the first k are all 0s or all 9s,
+    where the estimate's error could have carried into them.
+    """
+    prec = k + _GUARD
+    bits = n.bit_length()
+    # keep a few more significant digits than the estimate has
+    drop = max(0, bits - math.ceil((prec + 4) / _LOG10_2))
+    with decimal.localcontext() as ctx:
+        ctx.prec = prec
+        ctx.Emax = decimal.MAX_EMAX
+        ctx.Emin = decimal.MIN_EMIN
+        estimate = decimal.Decimal(n >> drop) * decimal.Decimal(2) ** drop
+    coefficient = ''.join(map(str, estimate.as_tuple().digits))
+    coefficient = coefficient.ljust(prec, '0')
+    uncertain = coefficient[k:prec - 2]
+    if not uncertain.strip('0') or not uncertain.strip('9'):
+        return None
+    return coefficient[:k], estimate.adjusted() + 1
+
+
+def to_decimal(n):
+    """Return the decimal digits of an int, in subquadratic time.
+
+    Large values are split in halves by bits, converted to Decimal and
+    joined back with Decimal arithmetic, whose multiplication is
+    subquadratic.
+    """
+    if abs(n).bit_length() <= FAST_BITS:
+        return format(n, 'd')
+    if n < 0:
+        return '-' + to_decimal(-n)
+    powers = {}
+
+    def power(w):
+        # 2 ** w as a Decimal, reusing the powers already computed
+        result = powers.get(w)
+        if result is None:
+            if w <= _PIECE_BITS:
+                result = decimal.Decimal(1 << w)
+            else:
+                half = w >> 1
+                result = power(half) * power(w - half)
+            powers[w] = result
+        return result
+
+    def convert(n, w):
+        if w <= _PIECE_BITS:
+            return decimal.Decimal(n)
+        half = w >> 1
+        high = n >> half
+        low = n - (high << half)
+        return convert(low, half) + convert(high, w - half) * power(half)
+
+    with decimal.localcontext() as ctx:
+        ctx.prec = decimal.MAX_PREC
+        ctx.Emax = decimal.MAX_EMAX
+        ctx.Emin = decimal.MIN_EMIN
+        # the conversion must be exact
+        ctx.traps[decimal.Inexact] = True
+        return str(convert(n, n.bit_length()))
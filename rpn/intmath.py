@@ -0,0 +1,63 @@
+import math
+from operator import index
+
+# math.isqrt and math.comb are new in Python 3.8, math.lcm in 3.9.
+try:
+    from math import isqrt, comb
+except ImportError:
+    def isqrt(n):
+        """Return the largest integer whose square is at most n."""
+        n = index(n)
+        if n < 0:
+            raise ValueError('isqrt() argument must be nonnegative')
+        if n == 0:
+            return 0
+        x = 1 << (n.bit_length() + 1) // 2
+        while True:
+            y = (x + n // x) // 2
+            if y >= x:
+                return x
+            x = y
+
+    def comb(n, k):
+        """Return the number of ways to choose k items from n."""
+        n, k = index(n), index(k)
+        if n < 0 or k < 0:
+            raise ValueError('n and k must be non-negative integers')
+        if k > n:
+            return 0
+        k = min(k, n - k)
+        result = 1
+        for i in range(1, k + 1):
+            result = result * (n - k + i) // i
+        return result
+
+try:
+    from math import lcm
+except ImportError:
+    def lcm(a, b):
+        """Return the least common multiple of a and b."""
+        a, b = index(a), index(b)
+        if not a or not b:
+            return 0
+        return abs(a // math.gcd(a, b) * b)
+
+
+def ipow(a, b):
+    """Return a to the power of b, exactly, for integers with b >= 0."""
+    a, b = index(a), index(b)
+    if b < 0:
+        raise ValueError('ipow() exponent must be nonnegative')
+    return a ** b
+
+
+def powmod(a, b, m):
+    """Return a to the power of b, modulo m."""
+    return pow(index(a), index(b), index(m))
+
+
+def int_pow(a, b):
+    """pow that keeps integers exact, falling back to math.pow."""
+    if isinstance(a, int) and isinstance(b, int) and b >= 0:
+        return a ** b
+    return math.pow(a, b)
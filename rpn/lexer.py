@@ -0,0 +1,82 @@
+import re
+import math
+from functools import lru_cache
+from collections import namedtuple
+
+
+# Token kinds.
+NUMBER = 'number'
+ASSIGN = 'assign'
+COLUMN = 'column'
+NAME = 'name'
+
+Token = namedtuple('Token', ['kind', 'text', 'value'])
+
+# The alternatives are tried in the same order the old is_number() did:
+# decimal first, then binary, octal and finally hexadecimal, so that
+# e.g. "101" stays a decimal and "0b1" is not read as a hex number.
+_DIGITS = r'[0-9](?:_?[0-9])*'
+_NUMBER = re.compile(rf'''
+    (?P<int>[+-]?{_DIGITS})$
+  | (?P<float>[+-]?(?:
+        (?:{_DIGITS})?\.{_DIGITS}(?:[eE][+-]?{_DIGITS})?
+      | {_DIGITS}\.?(?:[eE][+-]?{_DIGITS})?
+      | inf(?:inity)? | nan
+    ))$
+  | (?P<bin>[+-]?0[bB](?:_?[01])+)$
+  | (?P<oct>[+-]?0[oO](?:_?[0-7])+)$
+  | (?P<hex>[+-]?(?:0[xX](?:_?[0-9a-fA-F])+|[0-9a-fA-F](?:_?[0-9a-fA-F])*))$
+''', re.VERBOSE | re.IGNORECASE)
+
+_ASSIGN = re.compile('^[A-Za-z0-9_-]*=$')
+
+# Floats below this magnitude convert to int without losing precision.
+_EXACT_FLOAT = 2 ** 53
+
+
+def _to_number(kind, s):
+    if kind == 'int':
+        return int(s)
+    if kind == 'float':
+        n = float(s)
+        # if number is a decimal with .0, we convert it to integer
+        if not math.isfinite(n) or math.modf(n)[0] != 0.0:
+            return n
+        if abs(n) < _EXACT_FLOAT:
+            return int(n)
+        # e.g. 1e30, which float() can't represent exactly
+        from decimal import Decimal
+        return int(Decimal(s.replace('_', '')))
+    if kind == 'bin':
+        return int(s, 2)
+    if kind == 'oct':
+        return int(s, 8)
+    return int(s, 16)
+
+
+@lru_cache(maxsize=4096)
+def parse_number(s):
+    """Parse a numeric literal in a single pass, None if s isn't one."""
+    m = _NUMBER.match(s)
+    if m is None:
+        return None
+    return _to_number(m.lastgroup, s)
+
+
+@lru_cache(maxsize=4096)
+def classify(s):
+    """Classify a single token."""
+    n = parse_number(s)
+    if n is not None:
+        return Token(NUMBER, s, n)
+    if _ASSIGN.match(s):
+        return Token(ASSIGN, s, s[:-1])
+    # column reference, eg. $bytes or $2
+    if len(s) > 1 and s[0] == '$':
+        return Token(COLUMN, s, s[1:])
+    return Token(NAME, s, None)
+
+
+def tokenize(line):
+    """Split an input line into classified tokens."""
+    return [classify(s) for s in line.split()]
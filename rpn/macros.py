@@ -0,0 +1,89 @@
+from itertools import count
+
+
+# Generations are unique across every Variables instance, so a program
+# compiled against one set of macros is never mistaken for another. The
+# exceptions are generation 0, shared by every empty Variables, and copies,
+# which share the generation of their original until either changes.
+_generations = count(1)
+
+
+class Macro:
+    """A macro body. The compiler fills in its code on first use."""
+    __slots__ = ('tokens', 'text', 'code', 'names')
+
+    def __init__(self, tokens):
+        self.tokens = tuple(tokens)
+        self.text = ' '.join(self.tokens)
+        # compiled body, with nested macros inlined; None when stale
+        self.code = None
+        # every name the compiled body refers to, including nested macros
+        self.names = frozenset()
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return repr(self.text)
+
+
+class Variables(dict):
+    """Variables and macros, keyed by name.
+
+    Compiled programs inline macro bodies and resolve operators at compile
+    time, so whenever a name is added, removed, or starts or stops being a
+    macro the generation is bumped and every macro that refers to the name
+    drops its compiled code. Updating an existing variable is free.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # every empty set of variables compiles programs the same way
+        self.generation = next(_generations) if self else 0
+
+    def copy(self):
+        """Return a copy, with macros that compile their own code."""
+        variables = Variables(
+            (name, Macro(value.tokens) if isinstance(value, Macro) else value)
+            for name, value in self.items())
+        # the copy compiles programs the same way until either changes
+        variables.generation = self.generation
+        return variables
+
+    def _changed(self, name):
+        self.generation = next(_generations)
+        for value in self.values():
+            if isinstance(value, Macro) and name in value.names:
+                value.code = None
+
+    def __setitem__(self, name, value):
+        if (name not in self or isinstance(value, Macro)
+                or isinstance(self[name], Macro)):
+            self._changed(name)
+        super().__setitem__(name, value)
+
+    def __delitem__(self, name):
+        super().__delitem__(name)
+        self._changed(name)
+
+    def pop(self, name, *default):
+        if name in self:
+            self._changed(name)
+        return super().pop(name, *default)
+
+    def popitem(self):
+        name, value = super().popitem()
+        self._changed(name)
+        return name, value
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def update(self, *args, **kwargs):
+        for name, value in dict(*args, **kwargs).items():
+            self[name] = value
+
+    def clear(self):
+        self.generation = 0
+        super().clear()
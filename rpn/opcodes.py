@@ -0,0 +1,58 @@
+# Opcodes. Every instruction is an (opcode, arg, func) tuple. Macros
+# cached by rpn.cache hold compiled code: bump its CACHE_FORMAT when
+# changing them.
+PUSH = 0    # push a pre-parsed literal: arg is the value
+CALL = 1    # call an operator: arg is the token, func the operator function
+REPEAT = 2  # the repeat operator, which is never repeated itself
+NAME = 3    # a variable slot: arg is the name, func an operator fallback
+STORE = 4   # "x=": arg is the variable name
+DEFINE = 5  # "macro name ...": arg is the name, func the body tokens
+LOAD = 6    # "$col": arg is the column reference
+SAVE = 7    # "save file": arg is the file name
+RESTORE = 8  # "load file": arg is the file name
+ENTER = 9   # an inlined macro body starts: arg is the macro name
+EXIT = 10   # an inlined macro body ends: arg is the macro name
+# Blocks: arg is the keyword, func a (bodies, raw bodies) pair of tuples of
+# compiled block bodies. The optimizer only rewrites the first; the raw
+# ones run while a repeat is pending.
+TIMES = 11  # "[ body ] n times"
+BRANCH = 12  # "c [ then ] if" and "c [ then ] [ else ] ifelse"
+WHILE = 13  # "[ body ] while", body runs again while it leaves true
+
+BLOCKS = (TIMES, BRANCH, WHILE)
+
+NAMES = ('PUSH', 'CALL', 'REPEAT', 'NAME', 'STORE', 'DEFINE', 'LOAD', 'SAVE',
+         'RESTORE', 'ENTER', 'EXIT', 'TIMES', 'BRANCH', 'WHILE')
+
+
+def walk(code):
+    """Yield every instruction of compiled code, including raw block bodies."""
+    for instruction in code:
+        yield instruction
+        if instruction[0] in BLOCKS:
+            for body in instruction[2][1]:
+                yield from walk(body)
+
+
+def disassemble(code, indent='  '):
+    """Return a human readable listing of compiled code."""
+    lines = []
+    for opcode, arg, func in code:
+        if opcode in BLOCKS:
+            lines.append(f'{indent}{NAMES[opcode]:<8}{arg}')
+            for n, body in enumerate(func[0]):
+                if n and body:
+                    lines.append(f'{indent}else')
+                if body:
+                    lines.append(disassemble(body, indent + '    '))
+            continue
+        if opcode == DEFINE:
+            arg = f"{arg} {' '.join(func)}"
+        elif opcode == LOAD:
+            arg = f'${arg}'
+        elif opcode != PUSH:
+            arg = str(arg)
+        else:
+            arg = repr(arg)
+        lines.append(f'{indent}{NAMES[opcode]:<8}{arg}')
+    return '\n'.join(lines)
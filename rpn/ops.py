@@ -1,512 +1,775 @@
 import operator
 import math
-import socket
-import random
-import secrets
 import sys
-import click
-from . import settings
-from .stack import stack
+from . import intmath
+from . import vector
+from .errors import OperatorError, SnapshotError, StackUnderflowError
 from collections import namedtuple
 
 
+Operation = namedtuple(
+    'op',
+    ['op_function', 'op_arity', 'op_type', 'op_description']
+)
+
+
+# Operator types whose operators only depend on their operands, and so
+# can be evaluated ahead of time.
+PURE_TYPES = frozenset({
+    'arithmetic', 'numeric', 'mathematic', 'trigonometric', 'constants',
+    'bitwise', 'boolean', 'comparison', 'networking', 'integer',
+})
+
+
 class Operations:
-    """Class for all operator functions."""
+    """Class for all operator functions, bound to an evaluation context."""
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.stack = ctx.stack
+
     def ops(self):
-        Operation = namedtuple(
-            'op',
-            ['op_function', 'op_type', 'op_description']
-        )
+        """Return the operator table, keyed by token."""
+        return self.table
+
+    @classmethod
+    def _build_table(cls):
+        # the table holds plain functions, called with the Operations
+        # instance of the context they run in, so it is built only once
+        # and compiled programs can be shared between contexts
         return {
             '+': Operation(
-                op_function=self.add,
+                op_function=cls.add,
+                op_arity=2,
                 op_type='arithmetic',
                 op_description='Add 2 top numbers on the stack.'
             ),
             '-': Operation(
-                op_function=self.sub,
+                op_function=cls.sub,
+                op_arity=2,
                 op_type='arithmetic',
                 op_description='Subtract 2 top numbers on the stack.'
             ),
             '/': Operation(
-                op_function=self.div,
+                op_function=cls.div,
+                op_arity=2,
                 op_type='arithmetic',
                 op_description='Divide 2 top numbers on the stack.'
             ),
             '*': Operation(
-                op_function=self.mul,
+                op_function=cls.mul,
+                op_arity=2,
                 op_type='arithmetic',
                 op_description='Multiply 2 top numbers on the stack.'
             ),
             '%': Operation(
-                op_function=self.mod,
+                op_function=cls.mod,
+                op_arity=2,
                 op_type='arithmetic',
                 op_description='Modulus 2 top numbers on the stack.'
             ),
             '++': Operation(
-                op_function=self.increment,
+                op_function=cls.increment,
+                op_arity=1,
                 op_type='arithmetic',
                 op_description='Increment top number on the stack.'
             ),
             '--': Operation(
-                op_function=self.decrement,
+                op_function=cls.decrement,
+                op_arity=1,
                 op_type='arithmetic',
                 op_description='Decrement top number on the stack.'
             ),
             'ceil': Operation(
-                op_function=self.ceil,
+                op_function=cls.ceil,
+                op_arity=1,
                 op_type='numeric',
                 op_description='Apply Ceiling to a top number on the stack.'
             ),
             'floor': Operation(
-                op_function=self.floor,
+                op_function=cls.floor,
+                op_arity=1,
                 op_type='numeric',
                 op_description='Apply Floor to a top number on the stack.'
             ),
             'round': Operation(
-                op_function=self.round,
+                op_function=cls.round,
+                op_arity=1,
                 op_type='numeric',
                 op_description='Round off top number on the stack.'
             ),
             'ip': Operation(
-                op_function=self.ip,
+                op_function=cls.ip,
+                op_arity=1,
                 op_type='numeric',
                 op_description='Get Integer part from the top number on the stack.'
             ),
             'fp': Operation(
-                op_function=self.fp,
+                op_function=cls.fp,
+                op_arity=1,
                 op_type='numeric',
                 op_description='Get Fraction part from the top number on the stack.'
             ),
             'sign': Operation(
-                op_function=self.sign,
+                op_function=cls.sign,
+                op_arity=2,
                 op_type='numeric',
                 op_description='Copy sign from 1 number to next.'
             ),
             'abs': Operation(
-                op_function=self.abs,
+                op_function=cls.abs,
+                op_arity=1,
                 op_type='numeric',
                 op_description='Get Absolute value of the top number on the stack.'
             ),
             'max': Operation(
-                op_function=self.max,
+                op_function=cls.max,
+                op_arity=2,
                 op_type='numeric',
                 op_description='Get the biggest number out of the 2 top numbers.'
             ),
             'min': Operation(
-                op_function=self.min,
+                op_function=cls.min,
+                op_arity=2,
                 op_type='numeric',
                 op_description='Get the smallest number out of the 2.'
             ),
             'exp': Operation(
-                op_function=self.exp,
+                op_function=cls.exp,
+                op_arity=1,
                 op_type='mathematic',
                 op_description='Apply Exponentiation to a top number on the stack.'
             ),
             'fact': Operation(
-                op_function=self.fact,
+                op_function=cls.fact,
+                op_arity=1,
                 op_type='mathematic',
                 op_description='Apply Factorial to a top number on the stack.'
             ),
             'sqrt': Operation(
-                op_function=self.sqrt,
+                op_function=cls.sqrt,
+                op_arity=1,
                 op_type='mathematic',
                 op_description='Square Root top number on the stack.'
             ),
             'ln': Operation(
-                op_function=self.nlog,
+                op_function=cls.nlog,
+                op_arity=2,
                 op_type='mathematic',
                 op_description='Apply Natural Logarithm to a top number on the stack.'
             ),
             'log': Operation(
-                op_function=self.log,
+                op_function=cls.log,
+                op_arity=1,
                 op_type='mathematic',
                 op_description='Apply Logarithm to a top number of the stack.'
             ),
             'pow': Operation(
-                op_function=self.pow,
+                op_function=cls.pow,
+                op_arity=2,
                 op_type='mathematic',
                 op_description='Apply power to the top number on the stack'
             ),
+            'ipow': Operation(
+                op_function=cls.ipow,
+                op_arity=2,
+                op_type='integer',
+                op_description='Raise an integer to a non-negative integer power, exactly.'
+            ),
+            'powmod': Operation(
+                op_function=cls.powmod,
+                op_arity=3,
+                op_type='integer',
+                op_description='Raise an integer to a power modulo a third one. Eg. 4 13 497 powmod'
+            ),
+            'isqrt': Operation(
+                op_function=cls.isqrt,
+                op_arity=1,
+                op_type='integer',
+                op_description='Get the integer square root of the top number on the stack.'
+            ),
+            'gcd': Operation(
+                op_function=cls.gcd,
+                op_arity=2,
+                op_type='integer',
+                op_description='Get the greatest common divisor of 2 top numbers.'
+            ),
+            'lcm': Operation(
+                op_function=cls.lcm,
+                op_arity=2,
+                op_type='integer',
+                op_description='Get the least common multiple of 2 top numbers.'
+            ),
+            'binom': Operation(
+                op_function=cls.binom,
+                op_arity=2,
+                op_type='integer',
+                op_description='Get the number of ways to choose k items from n. Eg. 52 5 binom'
+            ),
             'sin': Operation(
-                op_function=self.sin,
+                op_function=cls.sin,
+                op_arity=1,
                 op_type='trigonometric',
                 op_description='Applies Sin to the top number of the stack.'
             ),
             'asin': Operation(
-                op_function=self.asin,
+                op_function=cls.asin,
+                op_arity=1,
                 op_type='trigonometric',
                 op_description='Applies Asin to the top number of the stack.'
             ),
             'sinh': Operation(
-                op_function=self.sinh,
+                op_function=cls.sinh,
+                op_arity=1,
                 op_type='trigonometric',
                 op_description='Applies Sinh to the top number of the stack.'
             ),
             'asinh': Operation(
-                op_function=self.asinh,
+                op_function=cls.asinh,
+                op_arity=1,
                 op_type='trigonometric',
                 op_description='Applies Asinh to the top number of the stack.'
             ),
             'cos': Operation(
-                op_function=self.cos,
+                op_function=cls.cos,
+                op_arity=1,
                 op_type='trigonometric',
                 op_description='Applies Cos to the top number of the stack.'
             ),
             'acos': Operation(
-                op_function=self.acos,
+                op_function=cls.acos,
+                op_arity=1,
                 op_type='trigonometric',
                 op_description='Applies Acos to the top number of the stack.'
             ),
             'cosh': Operation(
-                op_function=self.cosh,
+                op_function=cls.cosh,
+                op_arity=1,
                 op_type='trigonometric',
                 op_description='Applies Cosh to the top number of the stack.'
             ),
             'acosh': Operation(
-                op_function=self.acosh,
+                op_function=cls.acosh,
+                op_arity=1,
                 op_type='trigonometric',
                 op_description='Applies Acosh to the top number of the stack.'
             ),
             'tan': Operation(
-                op_function=self.tan,
+                op_function=cls.tan,
+                op_arity=1,
                 op_type='trigonometric',
                 op_description='Applies Tan to the top number of the stack.'
             ),
             'atan': Operation(
-                op_function=self.atan,
+                op_function=cls.atan,
+                op_arity=1,
                 op_type='trigonometric',
                 op_description='Applies Atan to the top number of the stack.'
             ),
             'tanh': Operation(
-                op_function=self.tanh,
+                op_function=cls.tanh,
+                op_arity=1,
                 op_type='trigonometric',
                 op_description='Applies Tanh to the top number of the stack.'
             ),
             'atanh': Operation(
-                op_function=self.atanh,
+                op_function=cls.atanh,
+                op_arity=1,
                 op_type='trigonometric',
                 op_description='Applies Atanh to the top number of the stack.'
             ),
             'pi': Operation(
-                op_function=self.pi,
+                op_function=cls.pi,
+                op_arity=0,
                 op_type='constants',
                 op_description='Puts the PI constant on top of the stack.'
             ),
             'e': Operation(
-                op_function=self.e,
+                op_function=cls.e,
+                op_arity=0,
                 op_type='constants',
                 op_description='Puts the E constant on top of the stack.'
             ),
             'rand': Operation(
-                op_function=self.rand,
+                op_function=cls.rand,
+                op_arity=0,
                 op_type='random',
                 op_description='Puts a random number on top of the stack.'
             ),
             '&': Operation(
-                op_function=self.bit_and,
+                op_function=cls.bit_and,
+                op_arity=2,
                 op_type='bitwise',
                 op_description='Performs Bitwise AND on 2 top numbers on the stack.'
             ),
             '|': Operation(
-                op_function=self.bit_or,
+                op_function=cls.bit_or,
+                op_arity=2,
                 op_type='bitwise',
                 op_description='Performs Bitwise OR on 2 top numbers on the stack.'
             ),
             '^': Operation(
-                op_function=self.bit_xor,
+                op_function=cls.bit_xor,
+                op_arity=2,
                 op_type='bitwise',
                 op_description='Performs Bitwise XOR on 2 top numbers on the stack.'
             ),
             '~': Operation(
-                op_function=self.bit_not,
+                op_function=cls.bit_not,
+                op_arity=1,
                 op_type='bitwise',
                 op_description='Performs Bitwise NOT on 2 top numbers on the stack.'
             ),
             '>>': Operation(
-                op_function=self.bit_rshift,
+                op_function=cls.bit_rshift,
+                op_arity=2,
                 op_type='bitwise',
                 op_description='Performs Bitwise Right Shift on 2 top numbers on the stack.'
             ),
             'rshft': Operation(
-                op_function=self.bit_rshift,
+                op_function=cls.bit_rshift,
+                op_arity=2,
                 op_type='bitwise',
                 op_description='Performs Bitwise Right Shift on 2 top numbers on the stack.'
             ),
             '<<': Operation(
-                op_function=self.bit_lshift,
+                op_function=cls.bit_lshift,
+                op_arity=2,
                 op_type='bitwise',
                 op_description='Performs Bitwise Left Shift on 2 top numbers on the stack.'
             ),
             'lshft': Operation(
-                op_function=self.bit_lshift,
+                op_function=cls.bit_lshift,
+                op_arity=2,
                 op_type='bitwise',
                 op_description='Performs Bitwise Left Shift on 2 top numbers on the stack.'
             ),
             '&&': Operation(
-                op_function=self.bool_and,
+                op_function=cls.bool_and,
+                op_arity=2,
                 op_type='boolean',
                 op_description='Performs Boolean AND on 2 top numbers on the stack.'
             ),
             'and': Operation(
-                op_function=self.bool_and,
+                op_function=cls.bool_and,
+                op_arity=2,
                 op_type='boolean',
                 op_description='Performs Boolean AND on 2 top numbers on the stack.'
             ),
             '||': Operation(
-                op_function=self.bool_or,
+                op_function=cls.bool_or,
+                op_arity=2,
                 op_type='boolean',
                 op_description='Performs Boolean OR on 2 top numbers on the stack.'
             ),
             'or': Operation(
-                op_function=self.bool_or,
+                op_function=cls.bool_or,
+                op_arity=2,
                 op_type='boolean',
                 op_description='Performs Boolean OR on 2 top numbers on the stack.'
             ),
             '!': Operation(
-                op_function=self.bool_not,
+                op_function=cls.bool_not,
+                op_arity=1,
                 op_type='boolean',
                 op_description='Performs Boolean NOT on 2 top numbers on the stack.'
             ),
             'not': Operation(
-                op_function=self.bool_not,
+                op_function=cls.bool_not,
+                op_arity=1,
                 op_type='boolean',
                 op_description='Performs Boolean NOT on 2 top numbers on the stack.'
             ),
             '^^': Operation(
-                op_function=self.bool_xor,
+                op_function=cls.bool_xor,
+                op_arity=2,
                 op_type='boolean',
                 op_description='Performs Boolean XOR on 2 top numbers on the stack.'
             ),
             'less': Operation(
-                op_function=self.less,
+                op_function=cls.less,
+                op_arity=2,
                 op_type='comparison',
                 op_description='Applies "<" logic on 2 top numbers on the stack.'
             ),
             '<': Operation(
-                op_function=self.less,
+                op_function=cls.less,
+                op_arity=2,
                 op_type='comparison',
                 op_description='Applies "<" logic on 2 top numbers on the stack.'
             ),
             'lesseq': Operation(
-                op_function=self.less_equals,
+                op_function=cls.less_equals,
+                op_arity=2,
                 op_type='comparison',
                 op_description='Applies "<=" logic on 2 top numbers on the stack.'
             ),
             '<=': Operation(
-                op_function=self.less_equals,
+                op_function=cls.less_equals,
+                op_arity=2,
                 op_type='comparison',
                 op_description='Applies "<=" logic on 2 top numbers on the stack.'
             ),
             '==': Operation(
-                op_function=self.equals,
+                op_function=cls.equals,
+                op_arity=2,
                 op_type='comparison',
                 op_description='Applies "==" logic on 2 top numbers on the stack.'
             ),
             'eq': Operation(
-                op_function=self.equals,
+                op_function=cls.equals,
+                op_arity=2,
                 op_type='comparison',
                 op_description='Applies "==" logic on 2 top numbers on the stack.'
             ),
             '!=': Operation(
-                op_function=self.not_equals,
+                op_function=cls.not_equals,
+                op_arity=2,
                 op_type='comparison',
                 op_description='Applies "!=" logic on 2 top numbers on the stack.'
             ),
             'neq': Operation(
-                op_function=self.not_equals,
+                op_function=cls.not_equals,
+                op_arity=2,
                 op_type='comparison',
                 op_description='Applies "!=" logic on 2 top numbers on the stack.'
             ),
             '>': Operation(
-                op_function=self.more,
+                op_function=cls.more,
+                op_arity=2,
                 op_type='comparison',
                 op_description='Applies ">" logic on 2 top numbers on the stack.'
             ),
             'more': Operation(
-                op_function=self.more,
+                op_function=cls.more,
+                op_arity=2,
                 op_type='comparison',
                 op_description='Applies ">" logic on 2 top numbers on the stack.'
             ),
             '>=': Operation(
-                op_function=self.more_equals,
+                op_function=cls.more_equals,
+                op_arity=2,
                 op_type='comparison',
                 op_description='Applies ">=" logic on 2 top numbers on the stack.'
             ),
             'moreeq': Operation(
-                op_function=self.more_equals,
+                op_function=cls.more_equals,
+                op_arity=2,
                 op_type='comparison',
                 op_description='Applies ">=" logic on 2 top numbers on the stack.'
             ),
             'hnl': Operation(
-                op_function=self.hnl,
+                op_function=cls.hnl,
+                op_arity=1,
                 op_type='networking',
                 op_description='Convert Host to network long.'
             ),
             'hns': Operation(
-                op_function=self.hns,
+                op_function=cls.hns,
+                op_arity=1,
                 op_type='networking',
                 op_description='Convert Host to network short.'
             ),
             'nhl': Operation(
-                op_function=self.nhl,
+                op_function=cls.nhl,
+                op_arity=1,
                 op_type='networking',
                 op_description='Convert Network to host long.'
             ),
             'nhs': Operation(
-                op_function=self.nhs,
+                op_function=cls.nhs,
+                op_arity=1,
                 op_type='networking',
                 op_description='Convert Network to host short.'
             ),
             'pick': Operation(
-                op_function=self.pick,
+                op_function=cls.pick,
+                op_arity=1,
                 op_type='stack',
                 op_description='Pick the -nth item from the stack.'
             ),
             'depth': Operation(
-                op_function=self.depth,
+                op_function=cls.depth,
+                op_arity=0,
                 op_type='stack',
                 op_description='Push the current stack depth.'
             ),
             'drop': Operation(
-                op_function=self.drop,
+                op_function=cls.drop,
+                op_arity=1,
                 op_type='stack',
                 op_description='Drops the top item from the stack.'
             ),
             'dropn': Operation(
-                op_function=self.dropn,
+                op_function=cls.dropn,
+                op_arity=1,
                 op_type='stack',
                 op_description='Drops n items from the stack.'
             ),
             'dup': Operation(
-                op_function=self.dup,
+                op_function=cls.dup,
+                op_arity=1,
                 op_type='stack',
                 op_description='Duplicates the top stack item.'
             ),
             'dupn': Operation(
-                op_function=self.dupn,
+                op_function=cls.dupn,
+                op_arity=1,
                 op_type='stack',
                 op_description='Duplicates the top n stack items in order.'
             ),
             'roll': Operation(
-                op_function=self.roll,
+                op_function=cls.roll,
+                op_arity=1,
                 op_type='stack',
                 op_description='Roll the stack upwards by n.'
             ),
             'rolld': Operation(
-                op_function=self.rolld,
+                op_function=cls.rolld,
+                op_arity=1,
                 op_type='stack',
                 op_description='Roll the stack downwards by n.'
             ),
             'swap': Operation(
-                op_function=self.swap,
+                op_function=cls.swap,
+                op_arity=2,
                 op_type='stack',
                 op_description='Swap the top 2 stack items'
             ),
             'cla': Operation(
-                op_function=self.cla,
+                op_function=cls.cla,
+                op_arity=0,
                 op_type='stack',
                 op_description='Clear stack and variables.'
             ),
             'clr': Operation(
-                op_function=self.clr,
+                op_function=cls.clr,
+                op_arity=0,
                 op_type='stack',
                 op_description='Clear stack.'
             ),
             'clv': Operation(
-                op_function=self.clv,
+                op_function=cls.clv,
+                op_arity=0,
                 op_type='stack',
                 op_description='Clear variables.'
             ),
+            'iota': Operation(
+                op_function=cls.iota,
+                op_arity=1,
+                op_type='vector',
+                op_description='Push the vector 0, 1, ..., n-1.'
+            ),
+            'vec': Operation(
+                op_function=cls.vec,
+                op_arity=1,
+                op_type='vector',
+                op_description='Pack the top n stack items into a vector.'
+            ),
+            'sum': Operation(
+                op_function=cls.sum,
+                op_arity=1,
+                op_type='vector',
+                op_description='Sum the elements of a vector.'
+            ),
+            'mean': Operation(
+                op_function=cls.mean,
+                op_arity=1,
+                op_type='vector',
+                op_description='Average the elements of a vector.'
+            ),
+            'prod': Operation(
+                op_function=cls.prod,
+                op_arity=1,
+                op_type='vector',
+                op_description='Multiply the elements of a vector.'
+            ),
+            'vmin': Operation(
+                op_function=cls.vmin,
+                op_arity=1,
+                op_type='vector',
+                op_description='Get the smallest element of a vector.'
+            ),
+            'vmax': Operation(
+                op_function=cls.vmax,
+                op_arity=1,
+                op_type='vector',
+                op_description='Get the biggest element of a vector.'
+            ),
+            'vlen': Operation(
+                op_function=cls.vlen,
+                op_arity=1,
+                op_type='vector',
+                op_description='Get the number of elements of a vector.'
+            ),
+            'vector': Operation(
+                op_function=cls.toggle_vector,
+                op_arity=0,
+                op_type='vector',
+                op_description='Toggle vector mode. Operators apply element-wise to vectors.'
+            ),
+            'times': Operation(
+                op_function=None,
+                op_arity=1,
+                op_type='control',
+                op_description='Run a block n times. Eg. 1 [ 2 * ] 10 times'
+            ),
+            'if': Operation(
+                op_function=None,
+                op_arity=1,
+                op_type='control',
+                op_description='Run a block if the top number is true. Eg. dup 0 < [ -1 * ] if'
+            ),
+            'ifelse': Operation(
+                op_function=None,
+                op_arity=1,
+                op_type='control',
+                op_description='Run the first block if the top number is true, else the second. Eg. 2 % [ odd ] [ even ] ifelse'
+            ),
+            'while': Operation(
+                op_function=None,
+                op_arity=0,
+                op_type='control',
+                op_description='Run a block, then again for as long as it leaves a true number on top. Eg. [ 2 / dup 1 > ] while'
+            ),
             'repeat': Operation(
-                op_function=self.repeat,
+                op_function=cls.repeat,
+                op_arity=1,
                 op_type='extra',
                 op_description='Repeat next operation number of times.'
             ),
             'stack': Operation(
-                op_function=self.toggle_stack,
+                op_function=cls.toggle_stack,
+                op_arity=0,
                 op_type='extra',
                 op_description='Toggle stack display mode. Horizontal (default) or Vertical.'
             ),
             'mode': Operation(
-                op_function=self.toggle_stack,
+                op_function=cls.toggle_stack,
+                op_arity=0,
                 op_type='extra',
                 op_description='Toggle stack display mode. Horizontal (default) or Vertical.'
             ),
             'verbose': Operation(
-                op_function=self.toggle_verbose,
+                op_function=cls.toggle_verbose,
+                op_arity=0,
                 op_type='extra',
                 op_description='Toggle verbose mode.'
             ),
             'debug': Operation(
-                op_function=self.toggle_verbose,
+                op_function=cls.toggle_verbose,
+                op_arity=0,
                 op_type='extra',
                 op_description='Toggle verbose mode.'
             ),
             'dbg': Operation(
-                op_function=self.toggle_verbose,
+                op_function=cls.toggle_verbose,
+                op_arity=0,
                 op_type='extra',
                 op_description='Toggle verbose mode.'
             ),
             'vars': Operation(
-                op_function=self.show_vars,
+                op_function=cls.show_vars,
+                op_arity=0,
                 op_type='extra',
                 op_description='Show current variables.'
             ),
             'binary': Operation(
-                op_function=self.toggle_bin,
+                op_function=cls.toggle_bin,
+                op_arity=0,
                 op_type='extra',
                 op_description='Toggle binary mode.'
             ),
             'bin': Operation(
-                op_function=self.toggle_bin,
+                op_function=cls.toggle_bin,
+                op_arity=0,
                 op_type='extra',
                 op_description='Toggle binary mode.'
             ),
             'octal': Operation(
-                op_function=self.toggle_oct,
+                op_function=cls.toggle_oct,
+                op_arity=0,
                 op_type='extra',
                 op_description='Toggle octal mode.'
             ),
             'oct': Operation(
-                op_function=self.toggle_oct,
+                op_function=cls.toggle_oct,
+                op_arity=0,
                 op_type='extra',
                 op_description='Toggle octal mode.'
             ),
             'decimal': Operation(
-                op_function=self.toggle_dec,
+                op_function=cls.toggle_dec,
+                op_arity=0,
                 op_type='extra',
                 op_description='Show decimal mode.'
             ),
             'hexadecimal': Operation(
-                op_function=self.toggle_hex,
+                op_function=cls.toggle_hex,
+                op_arity=0,
                 op_type='extra',
                 op_description='Show hexadecimal mode.'
             ),
+            'intpow': Operation(
+                op_function=cls.toggle_int_pow,
+                op_arity=0,
+                op_type='extra',
+                op_description='Toggle integer pow mode, where pow of integers stays an exact integer.'
+            ),
+            'digits': Operation(
+                op_function=cls.set_digits,
+                op_arity=1,
+                op_type='extra',
+                op_description='Show integers with more than n digits as their leading and trailing digits, 0 shows every digit. Eg. 40 digits'
+            ),
             'hex': Operation(
-                op_function=self.toggle_hex,
+                op_function=cls.toggle_hex,
+                op_arity=0,
                 op_type='extra',
                 op_description='Show hexadecimal mode.'
             ),
             'macro': Operation(
                 op_function=None,
+                op_arity=0,
                 op_type='extra',
                 op_description=
                 'Store a Macro inside a variable. Available only in interactive mode. Eg. macro mcr_name 1 2 +'
             ),
             'var=': Operation(
                 op_function=None,
+                op_arity=0,
                 op_type='extra',
                 op_description=
                 'Store the number on top of the stack into "var" variable. Available only in interactive mode. Eg. some_var='
             ),
+            'save': Operation(
+                op_function=None,
+                op_arity=0,
+                op_type='extra',
+                op_description=
+                'Save the stack and variables to a binary snapshot file. Eg. save state.rpns'
+            ),
+            'load': Operation(
+                op_function=None,
+                op_arity=0,
+                op_type='extra',
+                op_description=
+                'Replace the stack and variables with a snapshot\'s. Eg. load state.rpns'
+            ),
+            'prof': Operation(
+                op_function=cls.prof,
+                op_arity=0,
+                op_type='extra',
+                op_description='Show calls, time and failures of every operator and macro (needs --profile).'
+            ),
             'exit': Operation(
-                op_function=self.exit,
+                op_function=cls.exit,
+                op_arity=0,
                 op_type='extra',
                 op_description='Exit interactive mode.'
             ),
             'quit': Operation(
-                op_function=self.exit,
+                op_function=cls.exit,
+                op_arity=0,
                 op_type='extra',
                 op_description='Exit interactive mode.'
             ),
@@ -514,50 +777,107 @@ class Operations:
 
     def show_ops(self):
         """Show all available operations."""
+        echo = self.ctx.echo
         current_section = None
-        click.echo()
-        click.echo('AVAILABLE OPERATORS.')
-        for k, v in self.ops().items():
+        echo('')
+        echo('AVAILABLE OPERATORS.')
+        for k, v in self.table.items():
             if current_section != v.op_type:
-                click.echo(f'\n{v.op_type.capitalize()} Operators')
-                click.echo('=' * 79)
+                echo(f'\n{v.op_type.capitalize()} Operators')
+                echo('=' * 79)
                 current_section = v.op_type
-            click.echo(f'{k}\t: {v.op_description}')
-        click.echo()
+            echo(f'{k}\t: {v.op_description}')
+        echo('')
 
     def is_operator(self, s):
-        return s in self.ops()
+        return s in self.table
 
     def clr(self):
         """Clear stack."""
-        stack.clear()
+        self.stack.clear()
 
     def clv(self):
         """Clear variables and macros."""
-        settings.vars.clear()
+        self.ctx.vars.clear()
 
     def cla(self):
         """Clear stack, variables and macros."""
         self.clr()
         self.clv()
 
+    def failed(self, op_name):
+        """Report the exception an operator is handling.
+
+        Strict contexts raise it as an OperatorError, others only mention
+        it in verbose mode.
+        """
+        if self.ctx.profile is not None:
+            self.ctx.profile.failure()
+        if self.ctx.strict:
+            raise OperatorError(f'{op_name}() failed.') from sys.exc_info()[1]
+        if self.ctx.verbose:
+            self.ctx.echo(f'{op_name}() filed.')
+
+    def no_numpy(self):
+        message = 'NumPy is required for vector operations.'
+        if self.ctx.strict:
+            raise OperatorError(message)
+        self.ctx.echo(f'ERROR: {message}')
+
+    def underflow(self, op_name, num_of_args):
+        """Report an operator short of operands, which is then skipped."""
+        if self.ctx.profile is not None:
+            self.ctx.profile.failure()
+        if self.ctx.strict:
+            raise StackUnderflowError(
+                f'{op_name}() needs {num_of_args} items on the stack.')
+
+    def block_count(self, op_name):
+        """Pop how many times a block runs, 0 if that fails."""
+        if self.stack.size() < 1:
+            self.underflow(op_name, 1)
+            return 0
+        try:
+            return operator.index(self.stack.pop())
+        except TypeError:
+            self.failed(op_name)
+            return 0
+
+    def block_condition(self, op_name):
+        """Pop the condition of a block, None if that fails."""
+        if self.stack.size() < 1:
+            self.underflow(op_name, 1)
+            return None
+        try:
+            return bool(self.stack.pop())
+        except ValueError:
+            # eg. a vector
+            self.failed(op_name)
+            return None
+
     def run_op(self, op_name, op_func, num_of_args=2, push=True):
-        if stack.size() < num_of_args:
+        if self.stack.size() < num_of_args:
+            self.underflow(op_name, num_of_args)
             return None
         try:
             if (num_of_args == 1):
-                a = stack.pop()
-                x = op_func(a)
+                args = (self.stack.pop(),)
             elif (num_of_args == 2):
-                b, a = stack.pop(), stack.pop()
-                x = op_func(a, b)
+                b, a = self.stack.pop(), self.stack.pop()
+                args = (a, b)
+            elif (num_of_args == 3):
+                c, b, a = self.stack.pop(), self.stack.pop(), self.stack.pop()
+                args = (a, b, c)
             else:
-                x = op_func()
+                args = ()
+            # in vector mode, apply the operator element-wise to vectors
+            if self.ctx.vector and vector.has_array(args):
+                op_func = vector.ufunc(op_name, op_func)
+            x = op_func(*args)
             if push:
-                stack.push(x)
+                self.stack.push(x)
         except:
-            if settings.verbose:
-                click.echo(f'{op_name}() filed.')
+            self.failed(op_name)
 
     def add(self):
         """a + b"""
@@ -579,6 +899,14 @@ class Operations:
         """a % b"""
         self.run_op(op_name='mod', op_func=lambda a, b: a%b)
 
+    def rsub(self):
+        """b - a"""
+        self.run_op(op_name='rsub', op_func=lambda a, b: b-a)
+
+    def square(self):
+        """a * a"""
+        self.run_op(op_name='square', op_func=lambda a: a*a, num_of_args=1)
+
     def increment(self):
         """a++"""
         self.run_op(op_name='increment', op_func=lambda a: a+1, num_of_args=1)
@@ -745,6 +1073,7 @@ class Operations:
 
     def rand(self):
         """Random number"""
+        import secrets
         self.run_op(op_name='rand', op_func=lambda: secrets.SystemRandom().random(), num_of_args=0)
 
     def exp(self):
@@ -769,121 +1098,262 @@ class Operations:
 
     def pow(self):
         """a to the power of b"""
-        self.run_op(op_name='pow', op_func=math.pow)
+        if self.ctx.int_pow:
+            self.run_op(op_name='pow', op_func=intmath.int_pow)
+        else:
+            self.run_op(op_name='pow', op_func=math.pow)
+
+    def ipow(self):
+        """a to the power of b, exactly"""
+        self.run_op(op_name='ipow', op_func=intmath.ipow)
+
+    def powmod(self):
+        """a to the power of b, modulo c"""
+        self.run_op(op_name='powmod', op_func=intmath.powmod, num_of_args=3)
+
+    def isqrt(self):
+        """Integer square root of a"""
+        self.run_op(op_name='isqrt', op_func=intmath.isqrt, num_of_args=1)
+
+    def gcd(self):
+        """Greatest common divisor of a and b"""
+        self.run_op(op_name='gcd', op_func=math.gcd)
+
+    def lcm(self):
+        """Least common multiple of a and b"""
+        self.run_op(op_name='lcm', op_func=intmath.lcm)
+
+    def binom(self):
+        """a choose b"""
+        self.run_op(op_name='binom', op_func=intmath.comb)
 
     def hnl(self):
         """Host to network long"""
+        import socket
         self.run_op(op_name='hnl', op_func=lambda a: socket.htonl(int(a)), num_of_args=1)
 
     def hns(self):
         """Host to network short"""
+        import socket
         self.run_op(op_name='hns', op_func=lambda a: socket.htons(int(a)), num_of_args=1)
 
     def nhl(self):
         """Network to host long"""
+        import socket
         self.run_op(op_name='nhl', op_func=lambda a: socket.ntohl(int(a)), num_of_args=1)
 
     def nhs(self):
         """Network to host short"""
+        import socket
         self.run_op(op_name='nhs', op_func=lambda a: socket.htons(int(a)), num_of_args=1)
 
     def pick(self):
         """Pick the -ath item from the stack"""
-        self.run_op(op_name='pick', op_func=stack.pick, num_of_args=1, push=False)
+        self.run_op(op_name='pick', op_func=self.stack.pick, num_of_args=1, push=False)
 
     def depth(self):
         """Push the current stack depth"""
         try:
-            stack.depth()
+            self.stack.depth()
         except:
-            if settings.verbose:
-                click.echo(f'depth() filed.')
+            self.failed('depth')
 
     def drop(self):
         """Drops the top item from the stack"""
         try:
-            stack.drop()
+            self.stack.drop()
         except:
-            if settings.verbose:
-                click.echo(f'drop() filed.')
+            self.failed('drop')
+
+    def nip(self):
+        """Drops the item below the top of the stack"""
+        try:
+            self.stack.nip()
+        except:
+            self.failed('nip')
 
     def dropn(self):
         """Drops n items from the stack"""
-        self.run_op(op_name='dropn', op_func=stack.drop, num_of_args=1, push=False)
+        self.run_op(op_name='dropn', op_func=self.stack.drop, num_of_args=1, push=False)
 
     def dup(self):
         """Duplicates the top stack item"""
         try:
-            stack.dup()
+            self.stack.dup()
         except:
-            if settings.verbose:
-                click.echo(f'dup() filed.')
+            self.failed('dup')
 
     def dupn(self):
         """Duplicates the top n stack items in order."""
-        self.run_op(op_name='dupn', op_func=stack.dup, num_of_args=1, push=False)
+        self.run_op(op_name='dupn', op_func=self.stack.dup, num_of_args=1, push=False)
 
     def roll(self):
         """Roll the stack upwards by a."""
-        self.run_op(op_name='roll', op_func=stack.roll, num_of_args=1, push=False)
+        self.run_op(op_name='roll', op_func=self.stack.roll, num_of_args=1, push=False)
 
     def rolld(self):
         """Roll the stack downwards by a."""
-        self.run_op(op_name='rolld', op_func=stack.rolld, num_of_args=1, push=False)
+        self.run_op(op_name='rolld', op_func=self.stack.rolld, num_of_args=1, push=False)
 
     def swap(self):
         """Swap the top 2 stack items."""
         try:
-            stack.swap()
+            self.stack.swap()
+        except:
+            self.failed('swap')
+
+    def run_vector_op(self, op_name, op_func, num_of_args=1):
+        """Run an operator that needs NumPy."""
+        if not vector.available():
+            self.no_numpy()
+            return None
+        self.ctx.vector = True
+        self.run_op(op_name=op_name, op_func=op_func, num_of_args=num_of_args)
+
+    def iota(self):
+        """Vector 0 .. a-1"""
+        self.run_vector_op(op_name='iota', op_func=vector.iota)
+
+    def vec(self):
+        """Pack the top a items into a vector"""
+        if not vector.available():
+            self.no_numpy()
+            return None
+        try:
+            n = int(self.stack.peek()[0])
+            if self.stack.size() > n >= 0:
+                self.stack.pop()
+                items = self.stack.peek(n)
+                self.stack.drop(n)
+                self.stack.push(vector.pack(items))
+                self.ctx.vector = True
         except:
-            if settings.verbose:
-                click.echo(f'swap() filed.')
+            self.failed('vec')
+
+    def sum(self):
+        """Sum of the elements of a"""
+        self.run_vector_op(op_name='sum', op_func=lambda a: vector.reduce('sum', a))
+
+    def mean(self):
+        """Mean of the elements of a"""
+        self.run_vector_op(op_name='mean', op_func=lambda a: vector.reduce('mean', a))
+
+    def prod(self):
+        """Product of the elements of a"""
+        self.run_vector_op(op_name='prod', op_func=lambda a: vector.reduce('prod', a))
+
+    def vmin(self):
+        """Smallest element of a"""
+        self.run_vector_op(op_name='vmin', op_func=lambda a: vector.reduce('vmin', a))
+
+    def vmax(self):
+        """Biggest element of a"""
+        self.run_vector_op(op_name='vmax', op_func=lambda a: vector.reduce('vmax', a))
+
+    def vlen(self):
+        """Number of elements of a"""
+        self.run_vector_op(op_name='vlen', op_func=lambda a: vector.reduce('vlen', a))
+
+    def toggle_vector(self):
+        """Toggle vector mode."""
+        if not self.ctx.vector and not vector.available():
+            self.no_numpy()
+        else:
+            self.ctx.vector = not self.ctx.vector
 
     def toggle_stack(self):
         """Toggle between horizotal stack view and vertical stack view."""
-        if settings.stack_mode == 'h':
-            settings.stack_mode = 'v'
+        if self.ctx.stack_mode == 'h':
+            self.ctx.stack_mode = 'v'
         else:
-            settings.stack_mode = 'h'
+            self.ctx.stack_mode = 'h'
 
     def toggle_verbose(self):
         """Toggle verbose mode."""
-        settings.verbose = not settings.verbose
+        self.ctx.verbose = not self.ctx.verbose
 
     def toggle_bin(self):
         """Toggle binary mode."""
-        settings.base = 'b'
+        self.ctx.base = 'b'
 
     def toggle_oct(self):
         """Toggle octal mode."""
-        settings.base = 'o'
+        self.ctx.base = 'o'
 
     def toggle_dec(self):
         """Toggle decimal mode."""
-        settings.base = 'd'
+        self.ctx.base = 'd'
 
     def toggle_hex(self):
         """Toggle hexadecimal mode."""
-        settings.base = 'x'
+        self.ctx.base = 'x'
+
+    def toggle_int_pow(self):
+        """Toggle integer pow mode."""
+        self.ctx.int_pow = not self.ctx.int_pow
+
+    def set_digits(self):
+        """Set the number of digits integers are truncated to."""
+        if self.stack.size() < 1:
+            return None
+        n = self.stack.pop()
+        if type(n) is int and n >= 0:
+            self.ctx.digits = n
+        else:
+            self.failed('digits')
 
     def repeat(self):
         """Set the repeat var. Following ops will be repeated n times."""
-        if stack.size() < 1:
+        if self.stack.size() < 1:
             return None
         try:
-            n = stack.pop()
-            settings.repeat = n
+            n = self.stack.pop()
+            self.ctx.repeat = n
         except:
-            if settings.verbose:
-                click.echo(f'repeat() filed.')
+            self.failed('repeat')
+
+    def run_file_op(self, op_name, op_func, path):
+        """Run a snapshot function, reporting errors like other failures."""
+        if not self.ctx.files:
+            error = OperatorError(f'{op_name} is not available here.')
+        else:
+            try:
+                op_func(self.ctx, path)
+                return
+            except SnapshotError as e:
+                error = e
+        if self.ctx.strict:
+            raise error
+        self.ctx.echo(f'ERROR: {error}')
+
+    def save(self, path):
+        """Save the stack and variables to a snapshot file."""
+        from . import snapshot
+        self.run_file_op('save', snapshot.save, path)
+
+    def load(self, path):
+        """Replace the stack and variables with a snapshot's."""
+        from . import snapshot
+        self.run_file_op('load', snapshot.load, path)
 
     def show_vars(self):
         """Show all saved variables. Alternative to having a debug mode on."""
-        click.echo(settings.vars)
+        self.ctx.echo(self.ctx.vars)
+
+    def prof(self):
+        """Show the profile of the session."""
+        if self.ctx.profile is None:
+            self.ctx.echo('Profiling is off, start rpn with --profile.')
+        else:
+            self.ctx.echo(self.ctx.profile.report())
 
     def exit(self):
         """Exit the app."""
+        if self.ctx.strict:
+            raise OperatorError('exit is only available in interactive mode.')
         sys.exit()
 
 
-ops = Operations()
+# the operator table never changes, so build it once and share it between
+# every lookup instead of rebuilding it per token
+Operations.table = Operations._build_table()
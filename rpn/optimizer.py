@@ -0,0 +1,125 @@
+from collections import deque
+
+from .context import Context
+from .opcodes import PUSH, CALL, REPEAT, NAME, ENTER, EXIT, BLOCKS
+from .ops import Operations, PURE_TYPES
+
+# Stack operators that can be folded when their operands are literals.
+FOLDABLE_STACK_OPS = {'dup', 'swap', 'drop'}
+
+# Pairs of operators replaced by a single superinstruction.
+FUSED = {
+    ('dup', '*'): 'square',
+    ('swap', 'drop'): 'nip',
+    ('swap', '-'): 'rsub',
+}
+
+# Superinstructions and their arity.
+SUPERINSTRUCTIONS = {
+    'square': (Operations.square, 1),
+    'nip': (Operations.nip, 2),
+    'rsub': (Operations.rsub, 2),
+}
+
+# Pure operators whose result depends on a setting of the context, eg.
+# integer pow mode, so they can't be evaluated ahead of time.
+SETTING_DEPENDENT = {'pow'}
+
+# Pairs of operators that leave the stack as it was.
+NO_OPS = {('swap', 'swap'), ('dup', 'drop')}
+
+
+def optimize(code):
+    """Fold constants, fuse operator pairs and drop no-op sequences.
+
+    Only pure operators are rewritten. The first operator after a repeat
+    may run more than once, so it is left alone and nothing before it is
+    rewritten.
+    """
+    out = []
+    # instructions before the barrier are never rewritten
+    barrier = 0
+    pinned = False
+    for instruction in code:
+        opcode, arg = instruction[0], instruction[1]
+        if opcode in BLOCKS:
+            raw = instruction[2][1]
+            instruction = (opcode, arg,
+                           (tuple(optimize(body) for body in raw), raw))
+        if opcode == PUSH:
+            out.append(instruction)
+        elif opcode == CALL and not pinned:
+            _emit(out, barrier, instruction)
+        elif opcode in (ENTER, EXIT):
+            # macro markers only matter to the profiler
+            continue
+        else:
+            out.append(instruction)
+            barrier = len(out)
+            pinned = opcode == REPEAT or (opcode == NAME and arg == 'repeat')
+    return tuple(out)
+
+
+def _emit(out, barrier, instruction):
+    token = instruction[1]
+    previous = out[-1] if len(out) > barrier else None
+    if previous is not None and previous[0] == CALL:
+        pair = (previous[1], token)
+        if pair in NO_OPS:
+            out.pop()
+            return
+        if pair in FUSED:
+            out.pop()
+            name = FUSED[pair]
+            _emit(out, barrier, (CALL, name, SUPERINSTRUCTIONS[name][0]))
+            return
+    folded = _fold(out, barrier, instruction)
+    if folded is None:
+        out.append(instruction)
+    else:
+        out.extend((PUSH, value, None) for value in folded)
+
+
+def _arity(token):
+    """Return the arity of a foldable operator, None if it isn't one."""
+    op = Operations.table.get(token)
+    if op is not None:
+        if token in SETTING_DEPENDENT:
+            return None
+        if op.op_type in PURE_TYPES or token in FOLDABLE_STACK_OPS:
+            return op.op_arity
+        return None
+    if token in SUPERINSTRUCTIONS:
+        return SUPERINSTRUCTIONS[token][1]
+    return None
+
+
+def _fold(out, barrier, instruction):
+    """Evaluate an operator whose operands are all literals."""
+    token, func = instruction[1], instruction[2]
+    arity = _arity(token)
+    if arity is None or len(out) - barrier < arity:
+        return None
+    operands = out[len(out) - arity:] if arity else []
+    if any(operand[0] != PUSH for operand in operands):
+        return None
+    values = [operand[1] for operand in operands]
+    result = _evaluate(func, values)
+    # pure operators consume their operands and push a single result; if
+    # one failed, leave it to fail (and report) at run time
+    if result is None or (token not in FOLDABLE_STACK_OPS
+                          and len(result) != 1):
+        return None
+    del out[len(out) - arity:]
+    return result
+
+
+def _evaluate(func, values):
+    """Run an operator in a scratch context holding only values."""
+    scratch = Context()
+    scratch.stack.stack = deque(values)
+    try:
+        func(scratch.ops)
+        return list(scratch.stack.stack)
+    except Exception:
+        return None
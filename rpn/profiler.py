@@ -0,0 +1,125 @@
+from time import perf_counter
+
+from . import compiler
+from .macros import Macro
+from .opcodes import CALL, REPEAT, NAME, ENTER, EXIT
+
+
+class Monitor:
+    """Executes raw compiled code, watching every operator and macro.
+
+    Subclasses override enter, exit and run_op. A monitor can wrap an
+    inner one, eg. a trace around a profile, and passes every step on.
+    """
+    def __init__(self, inner=None):
+        self.inner = inner
+        # names of the macros being expanded, outermost first
+        self.chain = []
+
+    def enter(self, name):
+        self.chain.append(name)
+        if self.inner is not None:
+            self.inner.enter(name)
+
+    def exit(self):
+        self.chain.pop()
+        if self.inner is not None:
+            self.inner.exit()
+
+    def run_op(self, instruction, ctx):
+        if self.inner is not None:
+            self.inner.run_op(instruction, ctx)
+        else:
+            compiler.run_code((instruction,), ctx)
+
+    def execute(self, code, ctx):
+        """Execute raw compiled code like compiler.execute."""
+        depth = len(self.chain)
+        try:
+            for instruction in code:
+                opcode, arg, func = instruction
+                if opcode == ENTER:
+                    self.enter(arg)
+                elif opcode == EXIT:
+                    self.exit()
+                elif opcode == NAME and isinstance(ctx.vars.get(arg), Macro):
+                    # a macro run by name, eg. a recursive one
+                    self.enter(arg)
+                    compiler.run_code((instruction,), ctx)
+                    self.exit()
+                elif (opcode in (CALL, REPEAT, NAME) and func is not None
+                      and arg not in ctx.vars):
+                    self.run_op(instruction, ctx)
+                else:
+                    compiler.run_code((instruction,), ctx)
+        finally:
+            # an error leaves every macro it happened in
+            while len(self.chain) > depth:
+                self.exit()
+
+
+class Profile(Monitor):
+    """Calls, time and failures of every operator and macro a context runs.
+
+    Macro times include everything the macro ran, nested macros too.
+    Stats are [calls, seconds, failures, deepest expansion], keyed by
+    ('op', token) or ('macro', name).
+    """
+    def __init__(self, inner=None):
+        super().__init__(inner)
+        self.stats = {}
+        # when each macro in the chain started
+        self.starts = []
+        # the operator running now, its failures are counted against it
+        self.current = None
+        self.max_depth = 0
+
+    def _stats(self, key):
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = [0, 0.0, 0, 0]
+        return stats
+
+    def enter(self, name):
+        super().enter(name)
+        self.starts.append(perf_counter())
+        depth = len(self.chain)
+        stats = self._stats(('macro', name))
+        stats[0] += 1
+        stats[3] = max(stats[3], depth)
+        self.max_depth = max(self.max_depth, depth)
+
+    def exit(self):
+        name = self.chain[-1]
+        self.stats[('macro', name)][1] += perf_counter() - self.starts.pop()
+        super().exit()
+
+    def failure(self):
+        """Count a failure of the operator that is running."""
+        if self.current is not None:
+            self._stats(('op', self.current))[2] += 1
+
+    def run_op(self, instruction, ctx):
+        arg = instruction[1]
+        calls = 1 if arg == 'repeat' else ctx.repeat
+        previous, self.current = self.current, arg
+        start = perf_counter()
+        try:
+            super().run_op(instruction, ctx)
+        finally:
+            stats = self._stats(('op', arg))
+            stats[0] += calls
+            stats[1] += perf_counter() - start
+            self.current = previous
+
+    def report(self):
+        """Return the stats as a table, slowest first."""
+        lines = [f"{'name':<16}{'kind':<7}{'calls':>9}{'total ms':>11}"
+                 f"{'avg us':>10}{'failed':>8}{'depth':>7}"]
+        for (kind, name), (calls, seconds, failures, depth) in sorted(
+                self.stats.items(), key=lambda item: -item[1][1]):
+            average = seconds / calls * 1e6 if calls else 0.0
+            lines.append(f'{name:<16}{kind:<7}{calls:>9}{seconds * 1e3:>11.3f}'
+                         f'{average:>10.2f}{failures:>8}{depth or "":>7}')
+        lines.append(f'deepest macro expansion: {self.max_depth}')
+        return '\n'.join(lines)
@@ -0,0 +1,206 @@
+import asyncio
+import os
+import queue
+import signal
+import threading
+from functools import partial
+import click
+
+from . import compiler
+from .context import Context
+from .stack import CompactStorage
+from .tools import command_line_mode, generate_prompt, session
+
+# Longest request line a client can send.
+LINE_LIMIT = 1 << 16
+# Connections waiting to be accepted; bursts of clients connecting at once
+# are refused beyond this (or the system's limit, if lower).
+BACKLOG = 4096
+# Settings every connection inherits from the session the server runs in.
+SHARED_SETTINGS = ('verbose', 'base', 'vector', 'int_pow', 'digits')
+# Threads evaluating requests, so a long one doesn't hold up the others.
+WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+
+class Workers:
+    """A pool of daemon threads running functions for an event loop.
+
+    Unlike an executor's threads they don't keep the process alive, so
+    the server stops even while an expression that never ends runs.
+    """
+    def __init__(self, loop, count=WORKERS):
+        self.loop = loop
+        self.jobs = queue.SimpleQueue()
+        for _ in range(count):
+            threading.Thread(target=self.work, daemon=True).start()
+
+    def run(self, func, *args):
+        """Return a future for func(*args), run in a worker thread."""
+        future = self.loop.create_future()
+        self.jobs.put((future, func, args))
+        return future
+
+    def work(self):
+        while True:
+            future, func, args = self.jobs.get()
+            try:
+                result, error = func(*args), None
+            except BaseException as e:
+                result, error = None, e
+            self.loop.call_soon_threadsafe(_resolve, future, result, error)
+
+
+def _resolve(future, result, error):
+    if future.cancelled():
+        return
+    if error is None:
+        future.set_result(result)
+    else:
+        future.set_exception(error)
+
+
+def new_context(echo=None):
+    """Return a connection context holding the session's variables."""
+    compact = isinstance(session.stack.stack, CompactStorage)
+    ctx = Context(compact=compact, variables=session.vars, echo=echo)
+    for name in SHARED_SETTINGS:
+        setattr(ctx, name, getattr(session, name))
+    return ctx
+
+
+def respond(ctx, line):
+    """Evaluate one request line and return the reply lines.
+
+    Output of operators like vars comes first, prefixed with "# ", then
+    one line with the stack or an error. Return None if the line ends
+    the connection.
+    """
+    output = []
+    ctx.echo = lambda message: output.extend(
+        f'# {text}' for text in str(message).splitlines() or [''])
+    try:
+        compiler.run(compiler.compile(line.split(), ctx.vars), ctx)
+    except SystemExit:
+        # exit and quit end the connection, not the server
+        return None
+    except Exception as e:
+        # eg. a RecursionError from a macro that calls itself
+        output.append(f'ERROR: {e}')
+    else:
+        # replies are single lines, so the vertical display isn't used
+        ctx.stack_mode = 'h'
+        output.append(generate_prompt(ctx))
+    output.append('')
+    return '\n'.join(output)
+
+
+async def handle(workers, reader, writer):
+    """Serve one connection, replying to its lines in order.
+
+    Lines are evaluated by the workers, so a long evaluation only holds
+    up its own connection. An expression that never ends keeps its
+    worker busy until the server stops.
+    """
+    ctx = new_context()
+    # clients may be remote, keep them away from the server's files
+    ctx.files = False
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                writer.write(b'ERROR: line too long.\n')
+                break
+            if not line:
+                break
+            reply = await workers.run(
+                respond, ctx, line.decode(errors='replace'))
+            if reply is None:
+                break
+            writer.write(reply.encode())
+            # replies are buffered, so pipelined requests are answered
+            # without waiting for the client to read each one
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+def invoke(ctx, args):
+    """Run a forwarded command line and return its exit status."""
+    try:
+        command_line_mode(args, ctx)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else int(
+            e.code is not None)
+    except Exception as e:
+        ctx.echo(f'ERROR: {e}')
+        return 1
+    return 0
+
+
+async def handle_invocation(workers, reader, writer):
+    """Evaluate the arguments of one rpn command forwarded by the client.
+
+    The client sends the arguments separated by NULs; the reply is the
+    exit status on a line of its own, followed by the output.
+    """
+    output = []
+    ctx = new_context(echo=lambda message: output.append(f'{message}\n'))
+    # the client's directory isn't known, so relative names can't be
+    # resolved; it runs commands using files itself
+    ctx.files = False
+    try:
+        request = await reader.read()
+        status = await workers.run(
+            invoke, ctx, request.decode().split('\0'))
+        writer.write(f'{status}\n{"".join(output)}'.encode())
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def _serve(host, port, path, handler):
+    handler = partial(handler, Workers(asyncio.get_running_loop()))
+    if path:
+        server = await asyncio.start_unix_server(
+            handler, path, limit=LINE_LIMIT, backlog=BACKLOG)
+    else:
+        server = await asyncio.start_server(
+            handler, host, port, limit=LINE_LIMIT, backlog=BACKLOG)
+    address = path or f'{host}:{port}'
+    click.echo(f'Serving on {address}', err=True)
+    # stop cleanly when terminated, so the socket file is removed
+    loop = asyncio.get_running_loop()
+    stopped = loop.create_future()
+    loop.add_signal_handler(
+        signal.SIGTERM, stopped.set_result, None)
+    try:
+        async with server:
+            await stopped
+    finally:
+        if path:
+            os.unlink(path)
+
+
+def serve(host='127.0.0.1', port=7777, path=None):
+    """Evaluate lines from clients over TCP, or a Unix socket at path.
+
+    Every connection has its own stack and variables, starting with the
+    variables and macros of the session, eg. the ones from ~/.rpnrc.
+    """
+    try:
+        asyncio.run(_serve(host, port, path, handle))
+    except KeyboardInterrupt:
+        pass
+
+
+def daemon(path):
+    """Evaluate rpn commands forwarded by rpn.client on a Unix socket."""
+    try:
+        asyncio.run(_serve(None, None, path, handle_invocation))
+    except KeyboardInterrupt:
+        pass
@@ -1,5 +1,11 @@
+# Defaults for new evaluation contexts, see rpn.context.Context.
 verbose = False
 base = 'd'
-vars = {}
-repeat = 1
 stack_mode = 'h'
+vector = False
+# pow of integers gives exact integers instead of floats
+int_pow = False
+# integers with more digits are shown truncated, 0 shows every digit
+digits = 0
+# stack items shown by the prompt
+prompt_items = 20
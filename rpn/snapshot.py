@@ -0,0 +1,206 @@
+import io
+import mmap
+import struct
+import sys
+from array import array
+from itertools import groupby
+
+from . import vector
+from .errors import SnapshotError
+from .macros import Macro, Variables
+from .stack import CompactStorage, SEGMENT_SIZE
+
+# Snapshot layout, all integers little-endian:
+#
+#   header     MAGIC, format version (B), byte order of the arrays (B)
+#   variables  count (I), then for each: name, tag, value
+#   stack      runs until the end of the file: tag, count (Q), values
+#
+# Strings are a length (I) followed by UTF-8. Tags say how values are
+# stored: FLOATS and INTS runs are packed arrays in the byte order of the
+# header, BIGINTS are each a length (I) and two's complement bytes,
+# VECTORS are each a length (I) and a NumPy .npy file. Nothing is ever
+# pickled, so loading a snapshot can't run code.
+MAGIC = b'RPNS'
+VERSION = 2
+FLOATS, INTS, BIGINTS, VECTORS, MACRO = b'd', b'q', b'n', b'v', b'm'
+
+_HEADER = struct.Struct('<4sBB')
+_LENGTH = struct.Struct('<I')
+_COUNT = struct.Struct('<Q')
+_BYTE_ORDERS = ('little', 'big')
+
+_INT64_MIN = -(1 << 63)
+_INT64_MAX = (1 << 63) - 1
+
+
+def _tag(value):
+    t = type(value)
+    if t is float:
+        return FLOATS
+    if t is int:
+        return INTS if _INT64_MIN <= value <= _INT64_MAX else BIGINTS
+    if vector.is_array(value):
+        return VECTORS
+    raise SnapshotError(f'a {t.__name__} can\'t be saved')
+
+
+def _write_string(fp, s):
+    data = s.encode()
+    fp.write(_LENGTH.pack(len(data)))
+    fp.write(data)
+
+
+def _write_values(fp, tag, values):
+    """Write values that all have the same tag, without the tag."""
+    if tag in (FLOATS, INTS):
+        fp.write(array(tag.decode(), values).tobytes())
+        return
+    for value in values:
+        if tag == BIGINTS:
+            data = value.to_bytes(value.bit_length() // 8 + 1, 'little',
+                                  signed=True)
+        else:
+            buffer = io.BytesIO()
+            # object arrays would need a pickle, and are refused
+            vector.numpy().lib.format.write_array(buffer, value,
+                                                  allow_pickle=False)
+            data = buffer.getvalue()
+        fp.write(_LENGTH.pack(len(data)))
+        fp.write(data)
+
+
+def _runs(storage):
+    """Yield (tag, values) runs of the stack, bottom first."""
+    segments = storage.segments if isinstance(
+        storage, CompactStorage) else (storage,)
+    for segment in segments:
+        if type(segment) is array:
+            # already packed, write it as it is
+            yield segment.typecode.encode(), segment
+        else:
+            for tag, values in groupby(segment, _tag):
+                yield tag, list(values)
+
+
+def save(ctx, path):
+    """Write the stack and variables of a context to a snapshot file."""
+    try:
+        with open(path, 'wb') as fp:
+            byte_order = _BYTE_ORDERS.index(sys.byteorder)
+            fp.write(_HEADER.pack(MAGIC, VERSION, byte_order))
+            fp.write(_LENGTH.pack(len(ctx.vars)))
+            for name, value in ctx.vars.items():
+                _write_string(fp, name)
+                if isinstance(value, Macro):
+                    fp.write(MACRO)
+                    _write_string(fp, value.text)
+                else:
+                    tag = _tag(value)
+                    fp.write(tag)
+                    _write_values(fp, tag, (value,))
+            for tag, values in _runs(ctx.stack.stack):
+                fp.write(tag)
+                fp.write(_COUNT.pack(len(values)))
+                if type(values) is array:
+                    fp.write(values.tobytes())
+                else:
+                    _write_values(fp, tag, values)
+    except (OSError, ValueError, SnapshotError) as e:
+        raise SnapshotError(f'cannot save {path}: {e}') from e
+
+
+class _Reader:
+    """Reads a snapshot straight from a memory map."""
+    def __init__(self, view):
+        self.view = view
+        self.offset = 0
+
+    def at_end(self):
+        return self.offset >= len(self.view)
+
+    def take(self, n):
+        if self.offset + n > len(self.view):
+            raise SnapshotError('snapshot is truncated')
+        data = self.view[self.offset:self.offset + n]
+        self.offset += n
+        return data
+
+    def unpack(self, fmt):
+        return fmt.unpack(self.take(fmt.size))[0]
+
+    def string(self):
+        return str(self.take(self.unpack(_LENGTH)), 'utf-8')
+
+    def values(self, tag, count, swap):
+        """Return a list of count values, or arrays for packed runs."""
+        if tag in (FLOATS, INTS):
+            typecode = tag.decode()
+            size = array(typecode).itemsize
+            chunks = []
+            for start in range(0, count, SEGMENT_SIZE):
+                chunk = array(typecode)
+                chunk.frombytes(self.take(min(SEGMENT_SIZE, count - start)
+                                          * size))
+                if swap:
+                    chunk.byteswap()
+                chunks.append(chunk)
+            return chunks
+        if tag == BIGINTS:
+            return [int.from_bytes(self.take(self.unpack(_LENGTH)), 'little',
+                                   signed=True) for _ in range(count)]
+        if tag == VECTORS:
+            np = vector.numpy()
+            if np is None:
+                raise SnapshotError('NumPy is required to load vectors')
+            vectors = []
+            for _ in range(count):
+                data = io.BytesIO(self.take(self.unpack(_LENGTH)))
+                vectors.append(np.lib.format.read_array(
+                    data, allow_pickle=False))
+            return vectors
+        raise SnapshotError(f'unknown value tag {tag!r}')
+
+
+def load(ctx, path):
+    """Replace the stack and variables of a context with a snapshot's."""
+    try:
+        with open(path, 'rb') as fp, mmap.mmap(
+                fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                variables, runs = _read(view)
+    except (OSError, ValueError, SnapshotError, EOFError) as e:
+        raise SnapshotError(f'cannot load {path}: {e}') from e
+    ctx.vars = variables
+    ctx.stack.clear()
+    for packed, values in runs:
+        for chunk in values:
+            if packed:
+                ctx.stack.extend_array(chunk)
+            else:
+                ctx.stack.push(chunk)
+
+
+def _read(view):
+    reader = _Reader(view)
+    magic, version, byte_order = _HEADER.unpack(reader.take(_HEADER.size))
+    if magic != MAGIC or version != VERSION or byte_order > 1:
+        raise SnapshotError('not an rpn snapshot')
+    swap = _BYTE_ORDERS[byte_order] != sys.byteorder
+    variables = {}
+    for _ in range(reader.unpack(_LENGTH)):
+        name = reader.string()
+        tag = bytes(reader.take(1))
+        if tag == MACRO:
+            value = Macro(reader.string().split())
+        else:
+            value = reader.values(tag, 1, swap)
+            value = value[0][0] if tag in (FLOATS, INTS) else value[0]
+        variables[name] = value
+    runs = []
+    while not reader.at_end():
+        tag = bytes(reader.take(1))
+        count = reader.unpack(_COUNT)
+        runs.append((tag in (FLOATS, INTS), reader.values(tag, count, swap)))
+    # every value is in memory now, the map can be closed
+    return Variables(variables), runs
@@ -1,12 +1,230 @@
+from array import array
 from collections import deque
+from itertools import chain, islice
+
+# Number of values held by a single storage segment.
+SEGMENT_SIZE = 1 << 16
+# A run of values shorter than this isn't worth an array of its own.
+MIN_RUN = 16
+
+# Python type of the values held by each array typecode.
+_KINDS = {'d': float, 'q': int}
+
+_INT64_MIN = -(1 << 63)
+_INT64_MAX = (1 << 63) - 1
+
+
+def _typecode(value):
+    """Return the array typecode that holds value exactly, if any."""
+    t = type(value)
+    if t is float:
+        return 'd'
+    if t is int and _INT64_MIN <= value <= _INT64_MAX:
+        return 'q'
+    return None
+
+
+class CompactStorage:
+    """Deque-like storage packing runs of floats and ints into arrays.
+
+    Values are kept in segments of at most SEGMENT_SIZE items. Runs of
+    floats and 64-bit ints go into array('d') and array('q') segments;
+    bigints, bools and anything else go into plain list segments, which
+    also absorb short runs of mixed types.
+    """
+    __slots__ = ('segments', 'top', 'kind', 'base')
+
+    def __init__(self, iterable=()):
+        self.segments = []
+        self._sync()
+        self.extend(iterable)
+
+    def _sync(self):
+        """Cache the top segment, its value type and the size below it."""
+        segments = self.segments
+        self.top = segments[-1] if segments else None
+        if self.top is None or type(self.top) is list:
+            self.kind = None
+        else:
+            self.kind = _KINDS[self.top.typecode]
+        self.base = sum(map(len, segments)) - len(self.top or ())
+
+    def __repr__(self):
+        return f'CompactStorage({list(self)!r})'
+
+    def __len__(self):
+        return self.base + len(self.top or ())
+
+    def __iter__(self):
+        return chain.from_iterable(self.segments)
+
+    def __reversed__(self):
+        for segment in reversed(self.segments):
+            yield from reversed(segment)
+
+    def append(self, value):
+        top = self.top
+        if type(value) is self.kind and len(top) < SEGMENT_SIZE:
+            try:
+                top.append(value)
+                return
+            except OverflowError:
+                # a bigint, which doesn't fit an array('q')
+                pass
+        self._append_slow(value)
+
+    def _append_slow(self, value):
+        code = _typecode(value)
+        top = self.top
+        if top is not None and len(top) < SEGMENT_SIZE:
+            if type(top) is list:
+                top.append(value)
+                return
+            if len(top) < MIN_RUN:
+                self.segments[-1] = list(top)
+                self.segments[-1].append(value)
+                self._sync()
+                return
+        self.segments.append(array(code, (value,)) if code else [value])
+        self._sync()
+
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+
+    def extend_array(self, values):
+        """Append an array('d') or array('q') without unpacking it.
+
+        Arrays of up to SEGMENT_SIZE items become segments as they are,
+        so the caller must not modify them afterwards.
+        """
+        if len(values) < MIN_RUN:
+            self.extend(values)
+            return
+        for start in range(0, len(values), SEGMENT_SIZE):
+            self.segments.append(values[start:start + SEGMENT_SIZE]
+                                 if len(values) > SEGMENT_SIZE else values)
+        self._sync()
+
+    def pop(self):
+        top = self.top
+        if not top:
+            raise IndexError('pop from an empty stack')
+        value = top.pop()
+        if not top:
+            self.segments.pop()
+            self._sync()
+        return value
+
+    def clear(self):
+        self.segments.clear()
+        self._sync()
+
+    def _locate(self, index):
+        """Return the segment holding index and the offset inside it."""
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError('stack index out of range')
+        # walk from the nearest end, so reaching the top k items costs O(k)
+        if index >= length // 2:
+            k = length - index
+            for position in range(len(self.segments) - 1, -1, -1):
+                segment = self.segments[position]
+                if k <= len(segment):
+                    return position, len(segment) - k
+                k -= len(segment)
+        for position, segment in enumerate(self.segments):
+            if index < len(segment):
+                return position, index
+            index -= len(segment)
+
+    def __getitem__(self, index):
+        position, offset = self._locate(index)
+        return self.segments[position][offset]
+
+    def __setitem__(self, index, value):
+        position, offset = self._locate(index)
+        segment = self.segments[position]
+        if type(segment) is not list and segment.typecode != _typecode(value):
+            segment = self.segments[position] = list(segment)
+            self._sync()
+        segment[offset] = value
+
+    def __delitem__(self, index):
+        position, offset = self._locate(index)
+        segment = self.segments[position]
+        del segment[offset]
+        if not segment:
+            del self.segments[position]
+        self._sync()
+
+    def _pop_bottom(self, n):
+        """Remove and return the n bottom items."""
+        items = []
+        while len(items) < n:
+            segment = self.segments[0]
+            take = n - len(items)
+            items.extend(segment[:take])
+            if take >= len(segment):
+                del self.segments[0]
+            else:
+                del segment[:take]
+        self._sync()
+        return items
+
+    def _push_bottom(self, items):
+        """Add items below the bottom one, keeping their order."""
+        segments = self.segments
+        bottom = segments[0] if segments else None
+        # merge them into the bottom segment, so repeated rolls don't
+        # leave a trail of tiny segments behind
+        if bottom is not None and len(bottom) + len(items) <= SEGMENT_SIZE:
+            if type(bottom) is not list and any(
+                    _typecode(value) != bottom.typecode for value in items):
+                if len(bottom) >= MIN_RUN:
+                    bottom = None
+                else:
+                    bottom = segments[0] = list(bottom)
+            if bottom is not None:
+                bottom[:0] = items if type(bottom) is list else array(
+                    bottom.typecode, items)
+                self._sync()
+                return
+        segments[:0] = CompactStorage(items).segments
+        self._sync()
+
+    def rotate(self, n=1):
+        """Rotate n items from the top to the bottom, like deque.rotate."""
+        length = len(self)
+        if not length:
+            return
+        n %= length
+        # rotate whichever way moves fewer items
+        if n > length // 2:
+            n -= length
+        if n > 0:
+            items = [self.pop() for _ in range(n)]
+            items.reverse()
+            self._push_bottom(items)
+        elif n < 0:
+            self.extend(self._pop_bottom(-n))
 
 
 class Stack:
-    def __init__(self):
+    def __init__(self, compact=False):
         """Initiate our stack."""
         # the most used action in this app will be push() and pop()
-        # so deque() will be the best choice
-        self.stack = deque()
+        # so deque() will be the best choice, unless we are asked to keep
+        # numbers packed to save memory
+        self.stack = CompactStorage() if compact else deque()
+
+    def set_compact(self, compact=True):
+        """Switch between deque storage and compact array storage."""
+        if compact != isinstance(self.stack, CompactStorage):
+            self.stack = CompactStorage(self.stack) if compact else deque(
+                self.stack)
 
     def __repr__(self):
         return f'Stack({self.dump()!r})'
@@ -17,22 +235,33 @@ class Stack:
 
     def pop(self):
         """Pop top item from the stack."""
-        if not self.size():
+        try:
+            return self.stack.pop()
+        except IndexError:
             return None
-        return self.stack.pop()
 
     def push(self, item):
         """Add item to the top of the stack."""
         self.stack.append(item)
 
+    def extend_array(self, values):
+        """Push the items of an array('d') or array('q'), in order."""
+        if isinstance(self.stack, CompactStorage):
+            self.stack.extend_array(values)
+        else:
+            self.stack.extend(values)
+
     def size(self):
         """Return size of the stack."""
         return len(self.stack)
 
     def peek(self, n=1):
         """Look at n items on top of the stack."""
-        if self.size() >= n:
-            return list(self.stack)[-n:]
+        if n > 0 and self.size() >= n:
+            # walk from the top, so the cost depends on n, not the depth
+            items = list(islice(reversed(self.stack), n))
+            items.reverse()
+            return items
         else:
             return []
 
@@ -43,7 +272,7 @@ class Stack:
     def dup(self, n=1):
         """Diplicated n items on top of the stack and adds it to the stack."""
         if self.size() >= n:
-            self.stack += deque(self.peek(n))
+            self.stack.extend(self.peek(n))
 
     def depth(self):
         """Add the size of the stack to the top of the stack."""
@@ -52,14 +281,19 @@ class Stack:
     def drop(self, n=1):
         """Drop n items from the top of the stack."""
         if self.size() >= n:
-            if n == 1:
-                self.pop()
-            else:
-                self.stack = deque(list(self.stack)[:-n])
+            for _ in range(n):
+                self.stack.pop()
+
+    def nip(self):
+        """Drop the item below the top of the stack."""
+        if self.size() >= 2:
+            del self.stack[-2]
+        else:
+            self.drop()
 
     def roll(self, n=1):
         """Rotate stack n elements forwards."""
-        self.state.rotate(n)
+        self.stack.rotate(n)
 
     def rolld(self, n=1):
         """Rotate stack n elements backwards."""
@@ -73,10 +307,6 @@ class Stack:
     def pick(self, n=1):
         """Pop the nth item from the stack and append it to the stack."""
         if self.size() >= n:
-            stack = list(self.stack)
-            item = stack.pop(-n)
-            stack.append(item)
-            self.stack = deque(stack)
-
-
-stack = Stack()
+            item = self.stack[-n]
+            del self.stack[-n]
+            self.stack.append(item)
@@ -0,0 +1,63 @@
+import io
+import sys
+import click
+
+from . import lexer
+from . import compiler
+from .tools import apply_base, run, session
+
+# Size of the buffers used to read records and write results.
+BUFFER_SIZE = 1 << 20
+# Number of results written at once.
+BATCH_SIZE = 4096
+
+
+def fields(line):
+    """Split a record into fields, separated by whitespace or commas."""
+    return line.replace(',', ' ').split()
+
+
+def evaluate_record(program, record, ctx=session):
+    """Evaluate a program on a fresh stack holding the record's fields.
+
+    Return the formatted top of the stack, or an empty string if there is
+    no result or a field isn't a number.
+    """
+    stack = ctx.stack
+    stack.clear()
+    ctx.repeat = 1
+    for field in fields(record):
+        value = lexer.parse_number(field)
+        if value is None:
+            if ctx.verbose:
+                click.echo(f'ERROR: {field} is not a number.', err=True)
+            return ''
+        stack.push(value)
+    run(program, ctx)
+    if stack.size() > 0:
+        return f'{apply_base(stack.pop(), ctx)}'
+    return ''
+
+
+def stream_mode(commands, infile=None, outfile=None, ctx=session):
+    """Evaluate an expression once per line of infile, in constant memory."""
+    program = compiler.compile(commands, ctx.vars)
+    if infile is None:
+        infile = io.open(sys.stdin.fileno(), buffering=BUFFER_SIZE,
+                         closefd=False)
+    if outfile is None:
+        outfile = io.open(sys.stdout.fileno(), 'w', buffering=BUFFER_SIZE,
+                          closefd=False)
+    batch = []
+    try:
+        for record in infile:
+            batch.append(evaluate_record(program, record, ctx))
+            if len(batch) >= BATCH_SIZE:
+                batch.append('')
+                outfile.write('\n'.join(batch))
+                batch.clear()
+        if batch:
+            batch.append('')
+            outfile.write('\n'.join(batch))
+    finally:
+        outfile.flush()
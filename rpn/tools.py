@@ -1,21 +1,35 @@
 import sys
 import os
-import re
-import math
-import click
 
-from . import settings
-from .stack import stack
-from .ops import ops as operations
+from . import lexer
+from . import compiler
+from . import formatting
+from . import opcodes
+from . import vector
+from .context import Context
+from .errors import (ParseError, UnknownNameError, UnknownColumnError,
+                     SnapshotError)
+
+
+def echo(message='', err=False):
+    """Write a line to stdout, or to stderr, like click.echo."""
+    # one-line expressions don't import click, so output doesn't use it
+    file = sys.stderr if err else sys.stdout
+    file.write(f'{message}\n')
+    file.flush()
+
+
+# The context the command line and interactive modes evaluate in.
+session = Context(echo=echo)
 
 
 def show_ops():
-    operations.show_ops()
+    session.ops.show_ops()
 
 
 def show_examples():
     """Show some usage examples."""
-    click.echo(f"""
+    echo(f"""
 USAGE EXAMPLES.
 
 rpn                       - launch in interactive mode
@@ -82,190 +96,246 @@ $
     """)
 
 
-def generate_prompt():
-    """Generate interactive mode prompt output."""
+def generate_prompt(ctx=session):
+    """Generate interactive mode prompt output.
+
+    Only the top ctx.prompt_items items of the stack are shown, the ones
+    below them are counted.
+    """
     dbg_output = ''
     stack_output = ''
-    cur_stack = stack.dump()
+    depth = ctx.stack.size()
+    shown = min(depth, ctx.prompt_items)
+    texts = render_items(ctx.stack.peek(shown) if shown else [], ctx)
+    hidden = depth - shown
     # format verbose output
-    if settings.verbose and settings.stack_mode == 'h':
+    if ctx.verbose and ctx.stack_mode == 'h':
         tmp = []
-        for k, v in settings.vars.items():
+        for k, v in ctx.vars.items():
             tmp.append(f'{k}={v}')
         dbg_output = ', '.join(tmp)
         if dbg_output:
             dbg_output += ' '
-    elif settings.verbose and settings.stack_mode == 'v':
+    elif ctx.verbose and ctx.stack_mode == 'v':
         tmp = []
         dbg_output = 'Variables:\n================\n'
-        for k, v in settings.vars.items():
+        for k, v in ctx.vars.items():
             tmp.append(f'{k}={v}')
         dbg_output += '\n'.join(tmp)
-    # format stack output
-    if settings.stack_mode == 'h':
-        stack_output = [apply_base(n) for n in cur_stack]
-    elif settings.stack_mode == 'v':
-        stack_output = '\nStack:\n================\n'
-        for val in cur_stack:
-            stack_output += f'{apply_base(val)}\n--------\n'
+    # format stack output, the horizontal one like a list of the items
+    if ctx.stack_mode == 'h':
+        stack_output = repr(texts)
+        if hidden:
+            stack_output = f'[... {hidden} more' + (
+                f', {stack_output[1:]}' if texts else ']')
+    elif ctx.stack_mode == 'v':
+        items = ['\nStack:\n================\n']
+        if hidden:
+            items.append(f'... {hidden} more\n--------\n')
+        items.extend(f'{text}\n--------\n' for text in texts)
+        stack_output = ''.join(items)
     return f"{dbg_output}{stack_output}"
 
 
+def render_items(items, ctx=session):
+    """Format stack items, reusing the text of items shown last time.
+
+    The texts are kept in ctx.rendered, keyed by the id of the item, and
+    dropped when the base, vector mode or digits change.
+    """
+    key = (ctx.base, ctx.vector, ctx.digits)
+    cached_key, cache = ctx.rendered
+    if cached_key != key:
+        cache = {}
+    rendered = {}
+    texts = []
+    for item in items:
+        if type(item) is float:
+            # floats are shown as they are
+            texts.append(item)
+            continue
+        entry = cache.get(id(item))
+        # the item is kept with its text, so its id can't be reused
+        if entry is None or entry[0] is not item:
+            entry = (item, apply_base(item, ctx))
+        rendered[id(item)] = entry
+        texts.append(entry[1])
+    ctx.rendered = (key, rendered)
+    return texts
+
+
 def set_base(base):
     if base == '2':
-        settings.base = 'b'
+        session.base = 'b'
     elif base == '8':
-        settings.base = 'o'
+        session.base = 'o'
     elif base == '10':
-        settings.base = 'd'
+        session.base = 'd'
     elif base == '16':
-        settings.base = 'x'
+        session.base = 'x'
+
+
+def set_int_pow():
+    session.int_pow = True
+
+
+def set_digits(digits):
+    session.digits = digits
 
 
 def set_mode(mode):
-    settings.stack_mode = mode
+    session.stack_mode = mode
 
 
 def set_verbose():
-    settings.verbose = True
+    session.verbose = True
 
 
-def apply_base(n):
-    """Convert integer into a particular base number."""
-    # We can't convert floats, so we return them as is.
-    if isinstance(n, float):
-        return n
-    else:
-        return f'{n:{settings.base}}'
+def set_compact():
+    session.stack.set_compact(True)
 
 
-def is_number(n):
-    return is_bin(n) or is_oct(n) or is_dec(n) or is_hex(n)
+def set_vector():
+    if vector.available():
+        session.vector = True
+    else:
+        echo('WARNING: NumPy is not installed, vector mode is off.',
+             err=True)
 
 
-def is_bin(n):
+def load_array(path):
+    """Push a vector read from a text file."""
+    if not vector.available():
+        echo('ERROR: NumPy is required to load vectors.', err=True)
+        sys.exit(2)
     try:
-        int(n, 2)
-        return True
-    except ValueError:
-        return False
+        session.stack.push(vector.load(path))
+    except (OSError, ValueError) as e:
+        echo(f'ERROR: cannot load {path}: {e}', err=True)
+        sys.exit(2)
+    session.vector = True
 
 
-def is_oct(n):
-    try:
-        int(n, 8)
-        return True
-    except ValueError:
-        return False
+def start_profile():
+    """Profile the session, and report on stderr when rpn exits."""
+    import atexit
+    from .profiler import Profile
+    session.monitor = session.profile = Profile(session.monitor)
+    atexit.register(lambda: echo(session.profile.report(), err=True))
 
 
-def is_dec(n):
-    try:
-        float(n)
-        return True
-    except ValueError:
-        return False
+def start_trace(path, max_bytes):
+    """Trace the session to a JSON lines file, closed when rpn exits."""
+    import atexit
+    from .trace import Trace
+    session.monitor = Trace(path, max_bytes, inner=session.monitor)
+    atexit.register(session.monitor.close)
 
 
-def is_hex(n):
+def load_snapshot(path, ctx=session):
+    """Replace the stack and variables with those of a snapshot file."""
+    from . import snapshot
     try:
-        int(n, 16)
-        return True
-    except ValueError:
-        return False
+        snapshot.load(ctx, path)
+    except SnapshotError as e:
+        echo(f'ERROR: {e}', err=True)
+        sys.exit(2)
 
 
-def str_to_num(s):
-    # if number is a decimal with .0, we convert it to integer
-    if is_dec(s):
-        n = float(s)
-        if math.modf(n)[0] == 0.0:
-            return int(n)
-        return n
-    elif is_bin(s):
-        return int(s, 2)
-    elif is_oct(s):
-        return int(s, 8)
-    elif is_hex(s):
-        return int(s, 16)
+def save_snapshot(path, ctx=session):
+    """Write the stack and variables to a snapshot file."""
+    from . import snapshot
+    try:
+        snapshot.save(ctx, path)
+    except SnapshotError as e:
+        echo(f'ERROR: {e}', err=True)
+        sys.exit(2)
 
 
-def is_variable(v):
-    """Checks if argument is the variable or a macro."""
-    if v in settings.vars:
-        return True
-    return False
+def apply_base(n, ctx=session):
+    """Convert integer into a particular base number."""
+    # We can't convert floats, so we return them as is.
+    if isinstance(n, float):
+        return n
+    elif ctx.vector and vector.is_array(n):
+        return vector.format_array(n, ctx.base)
+    elif type(n) is int and n.bit_length() > ctx.long_bits:
+        # too long to show in full, or to convert the usual way
+        return formatting.format_int(n, ctx.base, ctx.digits)
+    else:
+        return f'{n:{ctx.base}}'
 
 
-def save_variable(var):
-    """Save variable."""
-    settings.vars[var] = stack.pop()
+def is_number(n):
+    return lexer.parse_number(n) is not None
 
 
-def save_macro(data):
-    """Save macro."""
-    macro_name, macro_data = data[0], ' '.join(data[1:])
-    settings.vars[macro_name] = macro_data
+def str_to_num(s):
+    return lexer.parse_number(s)
 
 
-def process_rpnrc():
-    """Read commands from ~/.rpnrc and execute them."""
+def process_rpnrc(ctx=session, scripts=()):
+    """Execute ~/.rpnrc and then script files, using the cache if we can."""
     home = os.path.expanduser('~')
     path = os.path.join(home, '.rpnrc')
-    if os.path.isfile(path):
-        with open(path) as fp:
-            for line in fp:
-                digest_input(line.split())
+    paths = [path] if os.path.isfile(path) else []
+    paths += scripts
+    if not paths:
+        return
+    # the cache imports pickle, only pay for it when there are files
+    from . import cache
+    state = None
+    for path in paths:
+        state = cache.run_file(path, ctx, state)
+
+
+def run(program, ctx=session):
+    """Run a program, exiting if it uses a name or column that is unknown."""
+    try:
+        compiler.run(program, ctx)
+    except (UnknownNameError, UnknownColumnError) as e:
+        ctx.echo(f'ERROR: {e}')
+        sys.exit(2)
 
 
-def digest_input(commands):
+def digest_input(commands, ctx=session):
     """Digest entire input string."""
     try:
-        reg = re.compile('^[A-Za-z0-9_-]*=$')
-        # detect macro command: eg. macro kb 1024 *
-        if commands[0] == 'macro':
-            save_macro(commands[1:])
-        # detecting "x=" command
-        elif reg.match(commands[0]):
-            save_variable(commands[0][:-1])
-        else:
-            for command in commands:
-                digest_command(command)
+        run(compiler.compile(commands, ctx.vars), ctx)
+    except ParseError as e:
+        # eg. an unmatched [, which is a ValueError too
+        ctx.echo(f'ERROR: {e}')
+        sys.exit(2)
     except ValueError:
-        if settings.verbose:
-            click.echo('Something went wrong. Please check your arguments.')
+        if ctx.verbose:
+            ctx.echo('Something went wrong. Please check your arguments.')
 
 
-def digest_command(command):
+def digest_command(command, ctx=session):
     """Digest a single command."""
-    if is_number(command):
-        stack.push(str_to_num(command))
-    elif is_variable(command):
-        variable_value = str(settings.vars[command])
-        digest_input(variable_value.split())
-    elif operations.is_operator(command):
-        op = operations.ops()[command].op_function
-        if command == 'repeat':
-            op()
-        else:
-            for _ in range(settings.repeat):
-                op()
-            settings.repeat = 1
-    else:
-        click.echo(
-            f'ERROR: {command} is not a number or a supported operator.')
-        sys.exit(2)
+    run(compiler.compile((command,), ctx.vars), ctx)
+
+
+def explain(commands):
+    """Show the compiled program before and after optimization."""
+    program = compiler.compile(commands, session.vars)
+    echo('Program:')
+    echo(opcodes.disassemble(program.raw))
+    echo('Optimized:')
+    echo(opcodes.disassemble(program.code))
 
 
-def command_line_mode(commands):
-    digest_input(commands)
-    if settings.verbose:
-        click.echo(generate_prompt())
-    if (stack.size() > 0):
-        click.echo(apply_base(stack.pop()))
+def command_line_mode(commands, ctx=session, save=None):
+    digest_input(commands, ctx)
+    if save:
+        save_snapshot(save, ctx)
+    if ctx.verbose:
+        ctx.echo(generate_prompt(ctx))
+    if (ctx.stack.size() > 0):
+        ctx.echo(apply_base(ctx.stack.pop(), ctx))
 
 
-def interactive_mode():
+def interactive_mode(save=None):
     while True:
         try:
             prompt = generate_prompt()
@@ -274,4 +344,6 @@ def interactive_mode():
                 digest_input(data.split())
         except:
             # to exit cleanly at ctrl+c or ctrl+z
+            if save:
+                save_snapshot(save)
             sys.exit()
@@ -0,0 +1,78 @@
+import json
+import os
+from time import monotonic_ns
+
+from .ops import Operations
+from .profiler import Monitor
+
+# Records kept in memory before they are written out.
+BUFFER_RECORDS = 4096
+
+# Size at which the trace file is rotated, and rotated files kept.
+MAX_BYTES = 64 << 20
+BACKUPS = 3
+
+
+class Trace(Monitor):
+    """Writes a JSON line for every operator a context runs.
+
+    Records hold a monotonic timestamp in nanoseconds, the token, its
+    operator type, the stack depth before and after and the names of the
+    macros it ran in, outermost first. Once the file reaches max_bytes it
+    is renamed to FILE.1, older ones to FILE.2 and so on, up to backups.
+    """
+    def __init__(self, path, max_bytes=MAX_BYTES, backups=BACKUPS,
+                 inner=None):
+        super().__init__(inner)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.buffer = []
+        self.fp = open(path, 'a', encoding='utf-8')
+        self.size = self.fp.tell()
+
+    def run_op(self, instruction, ctx):
+        token = instruction[1]
+        stack = ctx.stack
+        before = stack.size()
+        start = monotonic_ns()
+        try:
+            super().run_op(instruction, ctx)
+        finally:
+            self.buffer.append(json.dumps({
+                'ts': start,
+                'token': token,
+                'type': Operations.table[token].op_type,
+                'before': before,
+                'after': stack.size(),
+                'macros': self.chain,
+            }, separators=(',', ':')))
+            if len(self.buffer) >= BUFFER_RECORDS:
+                self.flush()
+
+    def flush(self):
+        """Write out the buffered records, rotating the file if needed."""
+        if not self.buffer:
+            return
+        data = '\n'.join(self.buffer) + '\n'
+        self.buffer.clear()
+        if self.size and self.size + len(data) > self.max_bytes:
+            self.rotate()
+        self.fp.write(data)
+        self.fp.flush()
+        self.size += len(data)
+
+    def rotate(self):
+        self.fp.close()
+        if self.backups:
+            for n in range(self.backups - 1, 0, -1):
+                older = f'{self.path}.{n}'
+                if os.path.exists(older):
+                    os.replace(older, f'{self.path}.{n + 1}')
+            os.replace(self.path, f'{self.path}.1')
+        self.fp = open(self.path, 'w', encoding='utf-8')
+        self.size = 0
+
+    def close(self):
+        self.flush()
+        self.fp.close()
@@ -0,0 +1,124 @@
+# NumPy support for vector mode. NumPy is optional: it is imported the
+# first time vector mode needs it, and rpn works without it.
+_numpy = None
+_ufuncs = None
+
+
+def numpy():
+    """Import NumPy on first use. Return None if it isn't installed."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+
+def available():
+    return numpy() is not None
+
+
+def is_array(n):
+    np = numpy()
+    return np is not None and isinstance(n, np.ndarray)
+
+
+def has_array(args):
+    np = numpy()
+    return np is not None and any(isinstance(a, np.ndarray) for a in args)
+
+
+def ufunc(op_name, op_func):
+    """Return the element-wise version of an operator function."""
+    global _ufuncs
+    if _ufuncs is None:
+        _ufuncs = _build_ufuncs(numpy())
+    return _ufuncs.get(op_name, op_func)
+
+
+def _flag(f):
+    """Turn a boolean ufunc into one returning 1 and 0, like the scalars."""
+    return lambda *args: f(*args).astype(int)
+
+
+def _build_ufuncs(np):
+    # operators not listed here (e.g. +, -, *, &, <<) already broadcast
+    return {
+        'not_equals': _flag(np.not_equal),
+        'bool_and': _flag(np.logical_and),
+        'bool_or': _flag(np.logical_or),
+        'bool_not': _flag(np.logical_not),
+        'bool_xor': _flag(np.logical_xor),
+        'less': _flag(np.less),
+        'less_equals': _flag(np.less_equal),
+        'equals': _flag(np.equal),
+        'more': _flag(np.greater),
+        'more_equals': _flag(np.greater_equal),
+        'sin': np.sin,
+        'asin': np.arcsin,
+        'sinh': np.sinh,
+        'asinh': np.arcsinh,
+        'cos': np.cos,
+        'acos': np.arccos,
+        'cosh': np.cosh,
+        'acosh': np.arccosh,
+        'tan': np.tan,
+        'atan': np.arctan,
+        'tanh': np.tanh,
+        'atanh': np.arctanh,
+        'ceil': np.ceil,
+        'floor': np.floor,
+        'round': np.rint,
+        'ip': lambda a: np.modf(a)[1],
+        'fp': lambda a: np.modf(a)[0],
+        'sign': np.copysign,
+        'abs': np.abs,
+        'max': np.maximum,
+        'min': np.minimum,
+        'exp': np.exp,
+        'sqrt': np.sqrt,
+        'nlog': lambda a, b: np.log(a) / np.log(b),
+        'log': np.log10,
+        'pow': np.float_power,
+        'ipow': np.power,
+        'gcd': np.gcd,
+        'lcm': np.lcm,
+    }
+
+
+def iota(n):
+    """Return the vector 0, 1, ..., n-1."""
+    return numpy().arange(int(n))
+
+
+def pack(items):
+    """Return the items as a vector."""
+    return numpy().array(items)
+
+
+def load(path):
+    """Load a vector from a text file of whitespace separated numbers."""
+    return numpy().loadtxt(path, ndmin=1)
+
+
+def reduce(name, a):
+    """Collapse a vector into a Python scalar."""
+    np = numpy()
+    func = {
+        'sum': np.sum,
+        'mean': np.mean,
+        'prod': np.prod,
+        'vmin': np.min,
+        'vmax': np.max,
+        'vlen': np.size,
+    }[name]
+    result = func(a)
+    return result.item() if hasattr(result, 'item') else result
+
+
+def format_array(a, base):
+    """Format a vector, applying the display base to integer elements."""
+    return numpy().array2string(
+        a, formatter={'int': lambda n: f'{n:{base}}'}, separator=' ')
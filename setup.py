@@ -2,9 +2,9 @@ import rpn
 import sys
 from setuptools import setup
 
-if sys.version_info.major < 3 or (sys.version_info.minor < 6
+if sys.version_info.major < 3 or (sys.version_info.minor < 7
                                   and sys.version_info.major == 3):
-    sys.exit('Python < 3.6 is unsupported.')
+    sys.exit('Python < 3.7 is unsupported.')
 
 with open('README.md', encoding='utf8') as file:
     long_description = file.read()
@@ -18,9 +18,10 @@ setup(
     packages=['rpn'],
     package_data={},
     install_requires=['click'],
+    extras_require={'vector': ['numpy']},
     license='GNU GPLv3',
     description='Reverse Polish Notation Calculator',
     long_description=long_description,
     long_description_content_type='text/markdown',
-    entry_points={'console_scripts': ['rpn = rpn.__main__:main']},
+    entry_points={'console_scripts': ['rpn = rpn.client:main']},
 )